@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from db import Database
+from outbound import Priority, outbound_priority
+from votes import VoteWriter
+
+logger = logging.getLogger(__name__)
+
+CLOSED_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[[
+    InlineKeyboardButton(text="🔒 Событие завершено", callback_data="ignore")
+]])
+
+
+class EventArchiver:
+    """Moves past events and their participants into ``events_archive``/``participants_archive``.
+
+    Every ``interval`` seconds events that started more than ``archive_after`` seconds
+    ago are moved in batches of ``batch_size``, one transaction per batch, then the
+    freed pages are returned to the filesystem with ``PRAGMA incremental_vacuum``.
+    With ``close_posts`` the keyboard of every post in ``publications`` is replaced by a
+    "closed" button.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        database: Database,
+        vote_writer: Optional[VoteWriter] = None,
+        on_archived: Optional[Callable[[list[int]], None]] = None,
+        archive_after: float = 6 * 3600,
+        interval: float = 3600,
+        batch_size: int = 200,
+        close_posts: bool = True,
+    ):
+        self.bot = bot
+        self.database = database
+        self.vote_writer = vote_writer
+        self.on_archived = on_archived
+        self.archive_after = archive_after
+        self.interval = interval
+        self.batch_size = batch_size
+        self.close_posts = close_posts
+        self.archived = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def enable_incremental_vacuum(self):
+        # auto_vacuum can only be switched on an existing database by rebuilding it once with VACUUM
+        row = await self.database.fetchone("PRAGMA auto_vacuum")
+        if row and row[0] == 2:
+            return
+        logger.info("Switching database to auto_vacuum=INCREMENTAL (one-time VACUUM)")
+        async with self.database.write() as db:
+            await db.commit()
+            await db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            await db.execute("VACUUM")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при архивации событий: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        if self.vote_writer is not None:
+            await self.vote_writer.flush()
+        cutoff = int(time.time() - self.archive_after)
+        total = 0
+        while True:
+            batch = await self._archive_batch(cutoff)
+            if batch is None:
+                break
+            event_ids, posts = batch
+            total += len(event_ids)
+            if self.on_archived is not None:
+                self.on_archived(event_ids)
+            if self.close_posts:
+                await self._close_posts(posts)
+        if total:
+            self.archived += total
+            async with self.database.write() as db:
+                # incremental_vacuum frees one page per step; execute() steps a row-less statement only once
+                await db.executescript("PRAGMA incremental_vacuum")
+            async with self.database.write() as db:
+                # Checkpoint outside the vacuum transaction so the WAL file shrinks too
+                await db.commit()
+                await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            logger.info(f"Archived {total} past events")
+        return total
+
+    async def _archive_batch(self, cutoff: int) -> Optional[tuple[list[int], list[tuple[Any, int]]]]:
+        async with self.database.write() as db:
+            cursor = await db.execute(
+                "SELECT event_id FROM events WHERE date_ts < ? ORDER BY date_ts LIMIT ?",
+                (cutoff, self.batch_size)
+            )
+            event_ids = [event_id for event_id, in await cursor.fetchall()]
+            if not event_ids:
+                return None
+            placeholders = ", ".join("?" * len(event_ids))
+            # Read before the events are deleted: publications go away with them (ON DELETE CASCADE)
+            cursor = await db.execute(
+                f"SELECT chat_id, message_id FROM publications WHERE event_id IN ({placeholders})", event_ids
+            )
+            posts = list(await cursor.fetchall())
+            # Not INSERT OR REPLACE: its implicit delete skips the full-text index triggers
+            await db.execute(f"DELETE FROM events_archive WHERE event_id IN ({placeholders})", event_ids)
+            await db.execute(
+                f"""
+                INSERT INTO events_archive
+                    (event_id, title, description, date, image_id, message_id, date_ts, archived_at)
+                SELECT event_id, title, description, date, image_id, message_id, date_ts, ?
+                FROM events WHERE event_id IN ({placeholders})
+                """,
+                (int(time.time()), *event_ids)
+            )
+            await db.execute(
+                f"""
+                INSERT OR REPLACE INTO participants_archive (event_id, user_id, username, participation_status)
+                SELECT event_id, user_id, username, participation_status
+                FROM participants WHERE event_id IN ({placeholders})
+                """,
+                event_ids
+            )
+            await db.execute(f"DELETE FROM participants WHERE event_id IN ({placeholders})", event_ids)
+            await db.execute(f"DELETE FROM events WHERE event_id IN ({placeholders})", event_ids)
+        return event_ids, posts
+
+    async def _close_posts(self, posts: Iterable[tuple[Any, int]]):
+        for chat_id, message_id in posts:
+            try:
+                with outbound_priority(Priority.BULK):
+                    await self.bot.edit_message_reply_markup(
+                        chat_id=chat_id, message_id=message_id, reply_markup=CLOSED_KEYBOARD
+                    )
+            except Exception as e:
+                logger.error(f"Не удалось закрыть пост {message_id} в чате {chat_id}: {e}")
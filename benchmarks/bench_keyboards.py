@@ -0,0 +1,78 @@
+"""Keyboard builder benchmark: per-click time and allocations with and without the keyboard cache.
+
+Usage: python benchmarks/bench_keyboards.py [--clicks 2000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import keyboards  # noqa: E402
+
+
+def months(clicks: int):
+    # Admins paging back and forth around the current month, as in process_calendar_navigation
+    today = date.today()
+    for click in range(clicks):
+        offset = click % 6 - 2
+        month_index = today.year * 12 + today.month - 1 + offset
+        yield month_index // 12, month_index % 12 + 1
+
+
+SCENARIOS = {
+    "create_calendar": (
+        lambda year, month: keyboards._build_calendar.__wrapped__(year, month, date.today()),
+        keyboards.create_calendar,
+    ),
+    "create_time_keyboard": (
+        lambda year, month: keyboards.create_time_keyboard.__wrapped__(),
+        lambda year, month: keyboards.create_time_keyboard(),
+    ),
+    "start_keyboard": (
+        lambda year, month: keyboards.start_keyboard.__wrapped__(),
+        lambda year, month: keyboards.start_keyboard(),
+    ),
+}
+
+
+def measure(build, clicks: int) -> tuple[float, float, float]:
+    """Returns (microseconds per click, KiB allocated per click, peak KiB)."""
+    calls = list(months(clicks))
+    for year, month in calls[:12]:
+        build(year, month)  # warm-up: measure the steady state, not the first misses
+    start = time.perf_counter()
+    for year, month in calls:
+        build(year, month)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    kept = [build(year, month) for year, month in calls]
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return elapsed / clicks * 1e6, (after - before) / clicks / 1024, peak / 1024
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--clicks", type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    print(f"{args.clicks} clicks per scenario")
+    print(f"{'builder':<22}{'mode':<10}{'us/click':>10}{'KiB/click':>11}{'peak KiB':>10}")
+    for name, (uncached, cached) in SCENARIOS.items():
+        keyboards._build_calendar.cache_clear()
+        keyboards.create_time_keyboard.cache_clear()
+        keyboards.start_keyboard.cache_clear()
+        for mode, build in (("uncached", uncached), ("cached", cached)):
+            per_click, allocated, peak = measure(build, args.clicks)
+            print(f"{name:<22}{mode:<10}{per_click:>10.1f}{allocated:>11.2f}{peak:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
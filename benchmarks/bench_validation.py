@@ -0,0 +1,84 @@
+"""Wizard step validation benchmark: whole-model validation with dateutil vs. Event.validate_field.
+
+Usage: python benchmarks/bench_validation.py [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dateutil import parser
+from pydantic import BaseModel, field_validator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Event, parse_event_date  # noqa: E402
+
+
+class LegacyEvent(BaseModel):
+    """The Event model as it was before validate_field: dateutil on every construction."""
+    title: str
+    description: str
+    date: str
+    image_id: Optional[str] = None
+
+    @field_validator("title")
+    def validate_title(cls, value):
+        if len(value) > 100 or len(value.strip()) == 0:
+            raise ValueError("title")
+        return value
+
+    @field_validator("description")
+    def validate_description(cls, value):
+        if len(value) > 1000 or len(value.strip()) == 0:
+            raise ValueError("description")
+        return value
+
+    @field_validator("date")
+    def validate_date(cls, value):
+        if parser.parse(value, dayfirst=True) < datetime.now():
+            raise ValueError("date")
+        return value
+
+
+TITLE = "Настольные игры в пятницу"
+DESCRIPTION = "Собираемся в антикафе, приносите свои игры. " * 10
+DATE = (datetime.now() + timedelta(days=30)).strftime("%d.%m.%Y 19:30")
+
+
+def legacy_step(field: str):
+    # What process_title / process_description / process_time_callback did
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%d.%m.%Y %H:%M")
+    values = {"title": "test", "description": "test", "date": tomorrow}
+    values[field] = {"title": TITLE, "description": DESCRIPTION, "date": DATE}[field]
+    return lambda: LegacyEvent(**values)
+
+
+def field_step(field: str):
+    value = {"title": TITLE, "description": DESCRIPTION, "date": DATE}[field]
+    return lambda: Event.validate_field(field, value)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--iterations", type=int, default=20000)
+    args = arg_parser.parse_args()
+    n = args.iterations
+
+    print(f"{n} iterations, date {DATE!r}")
+    print(f"{'step':<26}{'legacy us':>12}{'new us':>10}{'speedup':>10}")
+    rows = [(f"{field} step", legacy_step(field), field_step(field)) for field in ("title", "description", "date")]
+    rows.append(("date parse", lambda: parser.parse(DATE, dayfirst=True), lambda: parse_event_date(DATE)))
+    rows.append(("full Event (save_event)",
+                 lambda: LegacyEvent(title=TITLE, description=DESCRIPTION, date=DATE),
+                 lambda: Event(title=TITLE, description=DESCRIPTION, date=DATE)))
+    for name, legacy, new in rows:
+        legacy_us = timeit.timeit(legacy, number=n) / n * 1e6
+        new_us = timeit.timeit(new, number=n) / n * 1e6
+        print(f"{name:<26}{legacy_us:>12.2f}{new_us:>10.2f}{legacy_us / new_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
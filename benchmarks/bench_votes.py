@@ -0,0 +1,150 @@
+"""Vote storm benchmark: per-vote commits vs. VoteWriter write-behind batching.
+
+Usage: python benchmarks/bench_votes.py [--votes 5000] [--users 2000] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import Database  # noqa: E402
+from rosters import RosterCache  # noqa: E402
+from votes import VoteWriter  # noqa: E402
+
+SCHEMA = (
+    """CREATE TABLE events (
+        event_id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT NOT NULL,
+        date TEXT NOT NULL, image_id TEXT, message_id INTEGER, UNIQUE(title, date))""",
+    """CREATE TABLE participants (
+        event_id INTEGER, user_id INTEGER, username TEXT, participation_status TEXT,
+        PRIMARY KEY (event_id, user_id),
+        FOREIGN KEY (event_id) REFERENCES events (event_id) ON DELETE CASCADE)""",
+    "CREATE INDEX idx_participants_event_id ON participants(event_id)",
+    "INSERT INTO events (event_id, title, description, date) VALUES (1, 'bench', 'bench', '01.01.2099 12:00')",
+)
+
+
+async def run_bounded(handler, votes, concurrency: int) -> int:
+    """Run handlers with at most ``concurrency`` in flight; returns how many failed."""
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def bounded(vote):
+        nonlocal failed
+        async with semaphore:
+            try:
+                await handler(*vote)
+            except aiosqlite.OperationalError:
+                failed += 1
+
+    await asyncio.gather(*(bounded(vote) for vote in votes))
+    return failed
+
+
+def make_votes(count: int, users: int) -> list[tuple[int, str, str]]:
+    rng = random.Random(42)
+    return [
+        (user_id, f"user{user_id}", "Участвую" if rng.random() < 0.8 else "Не участвую")
+        for user_id in (rng.randrange(users) for _ in range(count))
+    ]
+
+
+async def create_db(path: str):
+    async with aiosqlite.connect(path) as db:
+        for statement in SCHEMA:
+            await db.execute(statement)
+        await db.commit()
+
+
+async def bench_connect_per_vote(path: str, votes, concurrency: int) -> tuple[float, int, int]:
+    # Baseline: what handle_participation did before the shared pool and the write-behind queue
+    async def vote(user_id, username, status):
+        async with aiosqlite.connect(path) as db:
+            await db.execute("SELECT event_id FROM events WHERE event_id = ?", (1,))
+            await db.execute(
+                "SELECT participation_status FROM participants WHERE event_id = ? AND user_id = ?", (1, user_id)
+            )
+            await db.execute(
+                "INSERT OR REPLACE INTO participants (event_id, user_id, username, participation_status) VALUES (?, ?, ?, ?)",
+                (1, user_id, username, status)
+            )
+            await db.commit()
+
+    start = time.perf_counter()
+    failed = await run_bounded(vote, votes, concurrency)
+    return time.perf_counter() - start, len(votes) - failed, failed
+
+
+async def bench_pool_per_vote(path: str, votes, concurrency: int) -> tuple[float, int, int]:
+    database = Database(path)
+    await database.open()
+
+    async def vote(user_id, username, status):
+        await database.fetchone(
+            "SELECT participation_status FROM participants WHERE event_id = ? AND user_id = ?", (1, user_id)
+        )
+        await database.execute(
+            "INSERT OR REPLACE INTO participants (event_id, user_id, username, participation_status) VALUES (?, ?, ?, ?)",
+            (1, user_id, username, status)
+        )
+
+    start = time.perf_counter()
+    failed = await run_bounded(vote, votes, concurrency)
+    elapsed = time.perf_counter() - start
+    await database.close()
+    return elapsed, len(votes) - failed, failed
+
+
+async def bench_write_behind(path: str, votes, concurrency: int) -> tuple[float, int, int]:
+    database = Database(path)
+    await database.open()
+    writer = VoteWriter(database)
+    writer.start()
+    rosters = RosterCache(database, writer)
+
+    async def vote(user_id, username, status):
+        await rosters.get(1)
+        writer.submit(1, user_id, username, status)
+        rosters.set_status(1, user_id, username, status)
+
+    start = time.perf_counter()
+    failed = await run_bounded(vote, votes, concurrency)
+    await writer.close()
+    elapsed = time.perf_counter() - start
+    await database.close()
+    return elapsed, writer.commits, failed
+
+
+async def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--votes", type=int, default=5000)
+    arg_parser.add_argument("--users", type=int, default=2000)
+    arg_parser.add_argument("--concurrency", type=int, default=32, help="handlers running at once")
+    args = arg_parser.parse_args()
+    votes = make_votes(args.votes, args.users)
+
+    print(f"{args.votes} votes from {args.users} users on one event, {args.concurrency} handlers at once")
+    print(f"{'mode':<28}{'seconds':>10}{'votes/s':>12}{'commits':>10}{'commits/s':>12}{'failed':>8}")
+    for name, bench in (
+        ("connect per vote (old)", bench_connect_per_vote),
+        ("pool, commit per vote", bench_pool_per_vote),
+        ("pool + write-behind", bench_write_behind),
+    ):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            await create_db(path)
+            elapsed, commits, failed = await bench(path, votes, args.concurrency)
+        print(
+            f"{name:<28}{elapsed:>10.3f}{len(votes) / elapsed:>12.0f}{commits:>10}{commits / elapsed:>12.1f}{failed:>8}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,340 @@
+"""Load test: replays synthetic update streams through the real router against a local fake Bot API.
+
+The bot from main.py is imported with a throwaway database and BOT_API_URL pointing at
+a stand-in for api.telegram.org running in a child process, so every send, edit, delete
+and callback answer makes a real HTTP round trip without touching Telegram.
+
+Scenarios:
+  votes   — many channel subscribers pressing join/decline on one event post
+  wizard  — many admins running the EventCreation wizard at the same time
+  events  — admins paging through a long show_events list and opening events
+
+Usage: python benchmarks/loadtest.py [--scenarios votes,wizard,events] [--voters 10000]
+       [--admins 200] [--events 5000] [--concurrency 64] [--api-latency 0] [--paced]
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHANNEL_ID = -1001234567890
+USER_ID_BASE = 10_000_000
+
+
+class FakeBotAPI:
+    """Answers Bot API calls the handlers make with minimal valid results and counts them.
+
+    Runs in its own process so serving it does not eat into the bot's event loop;
+    ``GET /stats`` returns the per-method call counts and ``POST /stats`` resets them.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self._message_ids = iter(range(1, 1 << 62))
+
+    def _message(self, data) -> dict:
+        chat_id = int(data.get("chat_id") or 0)
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "channel" if chat_id < 0 else "private"},
+            "text": data.get("text") or "",
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = await request.post()
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method in ("sendMessage", "sendPhoto", "sendDocument"):
+            return web.json_response({"ok": True, "result": self._message(data)})
+        if method in ("getMe",):
+            return web.json_response({"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "loadtest"}})
+        # answerCallbackQuery, editMessage*, deleteMessage and webhook calls all return True
+        return web.json_response({"ok": True, "result": True})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        calls = dict(self.calls)
+        if request.method == "POST":
+            self.calls.clear()
+        return web.json_response(calls)
+
+    def serve(self, port: int):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_route("*", "/stats", self.stats)
+        web.run_app(app, host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+async def api_calls(session: aiohttp.ClientSession, port: int, reset: bool = False) -> Counter:
+    async with session.request("POST" if reset else "GET", f"http://127.0.0.1:{port}/stats") as response:
+        return Counter(await response.json())
+
+
+class Updates:
+    """Builds raw update payloads the way Telegram delivers them."""
+
+    def __init__(self):
+        self._update_ids = iter(range(1, 1 << 62))
+        self._message_ids = iter(range(1, 1 << 62))
+
+    @staticmethod
+    def user(user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"user{user_id}"}
+
+    def message(self, user_id: int, text: str) -> dict:
+        return {"update_id": next(self._update_ids), "message": {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self.user(user_id),
+            "text": text,
+        }}
+
+    def callback(self, user_id: int, data: str, chat_id: int = None, message_id: int = 1) -> dict:
+        chat_id = user_id if chat_id is None else chat_id
+        return {"update_id": next(self._update_ids), "callback_query": {
+            "id": str(next(self._update_ids)),
+            "from": self.user(user_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "channel" if chat_id < 0 else "private"},
+                "text": "",
+            },
+        }}
+
+
+class Replay:
+    def __init__(self, main, dispatcher, concurrency: int):
+        self.main = main
+        self.dispatcher = dispatcher
+        self.concurrency = concurrency
+        self.latencies: list[float] = []
+        self.errors = 0
+
+    async def feed(self, update: dict):
+        start = time.perf_counter()
+        try:
+            await self.dispatcher.feed_raw_update(self.main.bot, update)
+        except Exception:
+            self.errors += 1
+        self.latencies.append(time.perf_counter() - start)
+
+    async def run(self, streams):
+        """Each stream is a list of updates from one user, fed in order; streams run concurrently."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_stream(stream):
+            async with semaphore:
+                for update in stream:
+                    await self.feed(update() if callable(update) else update)
+
+        await asyncio.gather(*(run_stream(stream) for stream in streams))
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+async def seed_events(main, count: int, rng: random.Random) -> list[tuple[int, int]]:
+    now = int(time.time())
+    rows = []
+    for index in range(count):
+        date_ts = now + rng.randrange(-30 * 86400, 365 * 86400)
+        date = datetime.fromtimestamp(date_ts).strftime("%d.%m.%Y %H:%M")
+        rows.append((f"Событие {index}", "Описание " * 20, date, date_ts))
+    async with main.database.write() as db:
+        await db.executemany(
+            "INSERT OR IGNORE INTO events (title, description, date, date_ts) VALUES (?, ?, ?, ?)", rows
+        )
+    return [(date_ts, event_id) for event_id, date_ts in await main.database.fetchall(
+        "SELECT event_id, date_ts FROM events ORDER BY date_ts, event_id"
+    )]
+
+
+def votes_streams(updates: Updates, event_id: int, voters: int, rng: random.Random):
+    # Most voters press once, some change their mind, a few double-tap
+    streams = []
+    for index in range(voters):
+        user_id = USER_ID_BASE + index
+        first = "join" if rng.random() < 0.8 else "decline"
+        presses = [first]
+        roll = rng.random()
+        if roll < 0.15:
+            presses.append("decline" if first == "join" else "join")
+        elif roll < 0.20:
+            presses.append(first)
+        streams.append([updates.callback(user_id, f"{action}_{event_id}", CHANNEL_ID, 1) for action in presses])
+    rng.shuffle(streams)
+    return streams
+
+
+def wizard_streams(updates: Updates, admins: list[int]):
+    year = datetime.now().year + 1
+    streams = []
+    for index, user_id in enumerate(admins):
+        month, day = index % 12 + 1, index % 28 + 1
+        streams.append([
+            # Built lazily so message dates and ids follow the order the replay actually feeds them
+            lambda user_id=user_id: updates.message(user_id, "📅 Создать событие"),
+            lambda user_id=user_id, index=index: updates.message(user_id, f"Нагрузочное событие {index}"),
+            lambda user_id=user_id: updates.message(user_id, "Описание нагрузочного события"),
+            lambda user_id=user_id: updates.callback(user_id, f"calendar_next_{year}_{month}"),
+            lambda user_id=user_id: updates.callback(user_id, f"date_{year}_{month}_{day}"),
+            lambda user_id=user_id: updates.callback(user_id, "time_18:00"),
+            lambda user_id=user_id: updates.message(user_id, "/skip"),
+        ])
+    return streams
+
+
+def events_streams(updates: Updates, admins: list[int], keys: list[tuple[int, int]], page_size: int,
+                   pages: int, rng: random.Random):
+    streams = []
+    for user_id in admins:
+        stream = [updates.message(user_id, "📋 Посмотреть события"), updates.callback(user_id, "events_first_1")]
+        # Follow the ➡️ buttons of the full list: each cursor is the last (date_ts, event_id) of a page
+        for page in range(1, pages):
+            if page * page_size > len(keys):
+                break
+            date_ts, event_id = keys[page * page_size - 1]
+            stream.append(updates.callback(user_id, f"events_next_1_{date_ts}_{event_id}"))
+        _, event_id = rng.choice(keys)
+        stream.append(updates.callback(user_id, f"view_{event_id}"))
+        streams.append(stream)
+    return streams
+
+
+async def run_scenario(name: str, main, dispatcher, stats: aiohttp.ClientSession, port: int, streams,
+                       concurrency: int) -> Counter:
+    replay = Replay(main, dispatcher, concurrency)
+    await api_calls(stats, port, reset=True)
+    commits_before = main.database.commits
+    batches_before = main.vote_writer.commits
+    start = time.perf_counter()
+    await replay.run(streams)
+    handled = time.perf_counter() - start
+    # Write-behind work is part of the cost of the scenario
+    await main.vote_writer.flush()
+    elapsed = time.perf_counter() - start
+    count = len(replay.latencies)
+    calls = await api_calls(stats, port)
+    print(
+        f"{name:<8}{count:>9}{elapsed:>9.2f}{count / handled:>11.0f}"
+        f"{percentile(replay.latencies, 0.5) * 1000:>9.2f}{percentile(replay.latencies, 0.99) * 1000:>9.2f}"
+        f"{max(replay.latencies, default=0) * 1000:>9.1f}"
+        f"{main.database.commits - commits_before:>9}{main.vote_writer.commits - batches_before:>9}"
+        f"{sum(calls.values()):>10}{replay.errors:>8}"
+    )
+    return calls
+
+
+async def wait_for_api(stats: aiohttp.ClientSession, port: int):
+    for _ in range(100):
+        try:
+            await api_calls(stats, port)
+            return
+        except aiohttp.ClientConnectionError:
+            await asyncio.sleep(0.05)
+    raise SystemExit("fake Bot API did not start")
+
+
+async def main_async(args, port: int):
+    stats = aiohttp.ClientSession()
+    await wait_for_api(stats, port)
+
+    main = importlib.import_module("main")
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(42)
+    admins = [USER_ID_BASE * 10 + index for index in range(args.admins)]
+    main.ALLOWED_IDS.extend(admins)
+    if not args.paced:
+        # Measure the handlers, not Telegram's flood limits: open the outbound buckets wide
+        main.outbound.private_chat_rate = main.outbound.group_chat_rate = 1e9
+        main.outbound.chat_burst = 1e9
+        main.outbound._global = main.outbound._global.__class__(1e9, 1e9)
+        main.outbound._answers = main.outbound._answers.__class__(1e9, 1e9)
+
+    dispatcher = main.create_dispatcher(background_jobs=False)
+    await dispatcher.emit_startup(bot=main.bot)
+    updates = Updates()
+    try:
+        print(f"{args.concurrency} users in flight, fake API latency {args.api_latency} ms"
+              f"{', Telegram rate limits on' if args.paced else ''}")
+        print(f"{'scenario':<8}{'updates':>9}{'seconds':>9}{'updates/s':>11}{'p50 ms':>9}{'p99 ms':>9}"
+              f"{'max ms':>9}{'commits':>9}{'batches':>9}{'API calls':>10}{'errors':>8}")
+        calls = {}
+        for scenario in args.scenarios.split(","):
+            if scenario == "votes":
+                event_id = (await seed_events(main, 1, rng))[0][1]
+                streams = votes_streams(updates, event_id, args.voters, rng)
+            elif scenario == "wizard":
+                streams = wizard_streams(updates, admins)
+            elif scenario == "events":
+                keys = await seed_events(main, args.events, rng)
+                streams = events_streams(updates, admins, keys, main.EVENTS_PAGE_SIZE, args.pages, rng)
+            else:
+                raise SystemExit(f"unknown scenario: {scenario}")
+            calls[scenario] = await run_scenario(scenario, main, dispatcher, stats, port, streams, args.concurrency)
+        print()
+        for scenario, counter in calls.items():
+            print(f"{scenario:<8}" + ", ".join(f"{method} {count}" for method, count in counter.most_common()))
+    finally:
+        await dispatcher.emit_shutdown(bot=main.bot)
+        await main.bot.session.close()
+        await stats.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--scenarios", default="votes,wizard,events")
+    arg_parser.add_argument("--voters", type=int, default=10_000)
+    arg_parser.add_argument("--admins", type=int, default=200)
+    arg_parser.add_argument("--events", type=int, default=5000, help="events seeded for the events scenario")
+    arg_parser.add_argument("--pages", type=int, default=5, help="pages each admin scrolls through")
+    arg_parser.add_argument("--concurrency", type=int, default=64, help="users sending updates at once")
+    arg_parser.add_argument("--api-latency", type=float, default=0.0, help="fake Bot API response delay, ms")
+    arg_parser.add_argument("--paced", action="store_true", help="keep the outbound queue's Telegram rate limits")
+    args = arg_parser.parse_args()
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    api = multiprocessing.Process(
+        target=FakeBotAPI(latency=args.api_latency / 1000).serve, args=(port,), name="fake-bot-api", daemon=True
+    )
+    api.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # main.py reads its configuration at import time
+            os.environ.update(
+                BOT_TOKEN="123456:loadtest", CHANNEL_ID=str(CHANNEL_ID), DB_PATH=os.path.join(tmp, "loadtest.db"),
+                BOT_API_URL=f"http://127.0.0.1:{port}",
+            )
+            asyncio.run(main_async(args, port))
+    finally:
+        api.terminate()
+        api.join()
+
+
+if __name__ == "__main__":
+    main()
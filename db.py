@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+# journal_mode is stored in the database file, so it is set once, on the writer
+WRITER_PRAGMAS = ("PRAGMA journal_mode=WAL",)
+# Per-connection settings
+PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+)
+
+
+class _TimedConnection:
+    """Connection wrapper that reports every statement's duration to ``on_query``."""
+
+    __slots__ = ("_conn", "_on_query")
+
+    def __init__(self, conn: aiosqlite.Connection, on_query: Callable[[str, float], None]):
+        self._conn = conn
+        self._on_query = on_query
+
+    async def _timed(self, call, sql: str, *args) -> Any:
+        start = time.perf_counter()
+        try:
+            return await call(sql, *args)
+        finally:
+            self._on_query(sql, time.perf_counter() - start)
+
+    async def execute(self, sql: str, parameters: Iterable[Any] = None) -> aiosqlite.Cursor:
+        return await self._timed(self._conn.execute, sql, parameters)
+
+    async def executemany(self, sql: str, parameters: Iterable[Iterable[Any]]) -> aiosqlite.Cursor:
+        return await self._timed(self._conn.executemany, sql, parameters)
+
+    async def executescript(self, sql: str) -> aiosqlite.Cursor:
+        return await self._timed(self._conn.executescript, sql)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+
+class Database:
+    """Long-lived connection pool: one serialized writer and several read-only readers.
+
+    ``on_query(sql, seconds)``, if set, is called after every statement and commit.
+    """
+
+    def __init__(self, path: str, readers: int = 4, cached_statements: int = 256,
+                 on_query: Optional[Callable[[str, float], None]] = None):
+        self.path = path
+        self.readers = readers
+        self.cached_statements = cached_statements
+        self.on_query = on_query
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._pool: asyncio.Queue = asyncio.Queue()
+        self._connections: list[aiosqlite.Connection] = []
+        self.commits = 0
+
+    async def _connect(self, readonly: bool = False) -> aiosqlite.Connection:
+        # sqlite3 keeps an LRU of prepared statements per connection; size it for all our queries
+        conn = await aiosqlite.connect(self.path, cached_statements=self.cached_statements)
+        for pragma in PRAGMAS if readonly else WRITER_PRAGMAS + PRAGMAS:
+            await conn.execute(pragma)
+        if readonly:
+            await conn.execute("PRAGMA query_only=ON")
+        self._connections.append(conn)
+        return conn
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def open(self):
+        if self._writer is not None:
+            return
+        self._writer = await self._connect()
+        for _ in range(self.readers):
+            self._pool.put_nowait(await self._connect(readonly=True))
+        logger.info(f"Database {self.path} opened: 1 writer, {self.readers} readers")
+
+    async def close(self):
+        if self._writer is None:
+            return
+        async with self._write_lock:
+            for conn in self._connections:
+                try:
+                    await conn.close()
+                except Exception as e:
+                    logger.error(f"Ошибка при закрытии соединения с БД: {e}")
+            self._connections.clear()
+            self._writer = None
+            self._pool = asyncio.Queue()
+        logger.info(f"Database {self.path} closed")
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[aiosqlite.Connection]:
+        conn = await self._pool.get()
+        try:
+            yield self._wrap(conn)
+        finally:
+            self._pool.put_nowait(conn)
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[aiosqlite.Connection]:
+        async with self._write_lock:
+            try:
+                yield self._wrap(self._writer)
+                start = time.perf_counter()
+                await self._writer.commit()
+                self.commits += 1
+                if self.on_query is not None:
+                    self.on_query("COMMIT", time.perf_counter() - start)
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+    def _wrap(self, conn: aiosqlite.Connection) -> aiosqlite.Connection:
+        return conn if self.on_query is None else _TimedConnection(conn, self.on_query)
+
+    async def fetchone(self, sql: str, params: Iterable[Any] = ()) -> Optional[aiosqlite.Row]:
+        async with self.read() as conn:
+            cursor = await conn.execute(sql, params)
+            try:
+                return await cursor.fetchone()
+            finally:
+                await cursor.close()
+
+    async def fetchall(self, sql: str, params: Iterable[Any] = ()) -> list:
+        async with self.read() as conn:
+            cursor = await conn.execute(sql, params)
+            try:
+                return list(await cursor.fetchall())
+            finally:
+                await cursor.close()
+
+    async def execute(self, sql: str, params: Iterable[Any] = ()) -> aiosqlite.Cursor:
+        async with self.write() as conn:
+            return await conn.execute(sql, params)
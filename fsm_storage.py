@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from db import Database
+
+logger = logging.getLogger(__name__)
+
+
+class _Record:
+    __slots__ = ("state", "data", "cached_at", "touched_at")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], touched_at: float):
+        self.state = state
+        self.data = data
+        self.cached_at = time.monotonic()
+        self.touched_at = touched_at
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage kept in the ``fsm_state`` table, with a write-through in-memory cache.
+
+    Every change is written to SQLite immediately, so wizards survive restarts and are
+    visible to other processes. Reads are served from the cache; with several processes
+    set ``cache_ttl`` so a record changed elsewhere is re-read after that many seconds
+    (0 reads through every time). Sessions untouched for ``session_ttl`` seconds are
+    deleted by a background task.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        key_builder: Optional[KeyBuilder] = None,
+        session_ttl: float = 24 * 3600,
+        cleanup_interval: float = 600,
+        cache_ttl: Optional[float] = None,
+        max_cached: int = 10_000,
+    ):
+        self.database = database
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.session_ttl = session_ttl
+        self.cleanup_interval = cleanup_interval
+        self.cache_ttl = cache_ttl
+        self.max_cached = max_cached
+        self._cache: OrderedDict[str, _Record] = OrderedDict()
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+
+    async def close(self):
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            try:
+                await self._cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self._cleanup_task = None
+        self._cache.clear()
+
+    async def _record(self, key: StorageKey) -> _Record:
+        storage_key = self.key_builder.build(key)
+        record = self._cache.get(storage_key)
+        if record is not None and (self.cache_ttl is None or time.monotonic() - record.cached_at < self.cache_ttl):
+            self._cache.move_to_end(storage_key)
+            return record
+        row = await self.database.fetchone(
+            "SELECT state, data, updated_at FROM fsm_state WHERE key = ?", (storage_key,)
+        )
+        if row is None:
+            record = _Record(None, {}, time.time())
+        else:
+            record = _Record(row[0], json.loads(row[1]) if row[1] else {}, row[2])
+        self._remember(storage_key, record)
+        return record
+
+    def _remember(self, storage_key: str, record: _Record):
+        self._cache[storage_key] = record
+        self._cache.move_to_end(storage_key)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    async def _write(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]):
+        storage_key = self.key_builder.build(key)
+        now = time.time()
+        if state is None and not data:
+            await self.database.execute("DELETE FROM fsm_state WHERE key = ?", (storage_key,))
+        else:
+            await self.database.execute(
+                "INSERT OR REPLACE INTO fsm_state (key, state, data, updated_at) VALUES (?, ?, ?, ?)",
+                (storage_key, state, json.dumps(data, ensure_ascii=False), now)
+            )
+        self._remember(storage_key, _Record(state, data, now))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        await self._write(key, state.state if isinstance(state, State) else state, record.data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._record(key)
+        await self._write(key, record.state, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key)).data.copy()
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        record = await self._record(key)
+        new_data = {**record.data, **data}
+        await self._write(key, record.state, new_data)
+        return new_data.copy()
+
+    async def cleanup(self) -> int:
+        cutoff = time.time() - self.session_ttl
+        cursor = await self.database.execute("DELETE FROM fsm_state WHERE updated_at < ?", (cutoff,))
+        for storage_key in [k for k, record in self._cache.items() if record.touched_at < cutoff]:
+            del self._cache[storage_key]
+        return cursor.rowcount
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            try:
+                removed = await self.cleanup()
+                if removed:
+                    logger.info(f"Removed {removed} expired FSM sessions")
+            except Exception as e:
+                logger.error(f"Ошибка при очистке FSM-сессий: {e}")
@@ -0,0 +1,193 @@
+import asyncio
+import csv
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional, TextIO
+
+from db import Database
+from models import DATE_FORMAT, Event, parse_event_date
+from publisher import PublishResult
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+IMPORT_FIELDS = ("title", "description", "date", "image_id")
+
+Row = tuple[int, dict[str, Any]]
+
+
+def import_format(filename: str) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in IMPORT_FORMATS:
+        raise ValueError("Поддерживаются файлы .csv и .jsonl")
+    return IMPORT_FORMATS[extension]
+
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[Row]:
+    """Yields (line number, fields) one row at a time; malformed JSON lines yield a None row."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for fields in reader:
+            yield reader.line_num, fields
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except json.JSONDecodeError:
+            fields = None
+        yield line_number, fields if isinstance(fields, dict) else None
+
+
+def validate_row(fields: Optional[dict[str, Any]]) -> Event:
+    """Checks a row with the same rules as the wizard and normalizes the date to ``DATE_FORMAT``."""
+    if fields is None:
+        raise ValueError("Строка не является JSON-объектом")
+    values = {}
+    for name in ("title", "description", "date"):
+        value = fields.get(name)
+        if value is None or value == "":
+            raise ValueError(f"Не заполнено поле {name}")
+        values[name] = Event.validate_field(name, str(value).strip())
+    values["date"] = parse_event_date(values["date"]).strftime(DATE_FORMAT)
+    image_id = fields.get("image_id") or None
+    return Event.model_construct(**values, image_id=str(image_id) if image_id else None)
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        # (line number, event_id, event) of rows written to the database
+        self.inserted: list[tuple[int, int, Event]] = []
+        self.errors: list[tuple[int, str]] = []
+        self.published = 0
+        self.publish_errors: list[tuple[int, str]] = []
+
+    def summary(self, max_errors: int = 20) -> str:
+        lines = [
+            f"📥 **Импорт**: строк {self.rows}, добавлено {len(self.inserted)}, отклонено {len(self.errors)}",
+        ]
+        if self.published or self.publish_errors:
+            lines.append(f"📢 Опубликовано {self.published}, не удалось {len(self.publish_errors)}")
+        problems = sorted(self.errors + self.publish_errors)
+        for line_number, error in problems[:max_errors]:
+            error = error.replace("_", "\\_").replace("*", "\\*").replace("`", "\\`")
+            lines.append(f"• строка {line_number}: {error}")
+        if len(problems) > max_errors:
+            lines.append(f"… и ещё {len(problems) - max_errors}")
+        return "\n".join(lines)
+
+
+class EventImporter:
+    """Bulk-creates events from parsed rows.
+
+    ``insert`` validates every row and writes the valid ones in a single transaction,
+    reporting ``UNIQUE(title, date)`` conflicts per row. ``publish`` then posts them
+    through ``publish_post`` (which should send at bulk priority, so the outbound queue
+    paces the channels, and leave the posts unrecorded), ``concurrency`` at a time, and
+    stores the posts with ``record_posts`` in batches of ``backfill_batch``. Chats that
+    failed are reported; events that reached no chat at all are deleted, as in the wizard.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        format_post: Callable[[Event], str],
+        publish_post: Callable[[int, Event], Awaitable[PublishResult]],
+        record_posts: Callable[[list[tuple[int, Any, int]]], Awaitable[None]],
+        on_inserted: Optional[Callable[[int, Event], None]] = None,
+        on_removed: Optional[Callable[[list[int]], None]] = None,
+        concurrency: int = 4,
+        backfill_batch: int = 50,
+    ):
+        self.database = database
+        self.format_post = format_post
+        self.publish_post = publish_post
+        self.record_posts = record_posts
+        self.on_inserted = on_inserted
+        self.on_removed = on_removed
+        self.concurrency = concurrency
+        self.backfill_batch = backfill_batch
+
+    async def insert(self, rows: Iterable[Row]) -> ImportReport:
+        report = ImportReport()
+        valid: list[tuple[int, Event]] = []
+        for line_number, fields in rows:
+            report.rows += 1
+            try:
+                event = validate_row(fields)
+                self.format_post(event)  # the post has to fit into a message or a photo caption
+            except ValueError as e:
+                report.errors.append((line_number, str(e)))
+                continue
+            valid.append((line_number, event))
+        if not valid:
+            return report
+
+        async with self.database.write() as db:
+            for line_number, event in valid:
+                cursor = await db.execute(
+                    "INSERT OR IGNORE INTO events (title, description, date, image_id, date_ts) VALUES (?, ?, ?, ?, ?)",
+                    (event.title, event.description, event.date, event.image_id,
+                     int(parse_event_date(event.date).timestamp()))
+                )
+                if cursor.rowcount == 0:
+                    report.errors.append((line_number, "событие с таким названием и датой уже существует"))
+                else:
+                    report.inserted.append((line_number, cursor.lastrowid, event))
+        if self.on_inserted is not None:
+            for _, event_id, event in report.inserted:
+                self.on_inserted(event_id, event)
+        logger.info(f"Imported {len(report.inserted)} of {report.rows} rows")
+        return report
+
+    async def publish(self, report: ImportReport):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        posted: list[tuple[int, Any, int]] = []
+        failed: list[int] = []
+        backfill_lock = asyncio.Lock()
+
+        async def backfill(force: bool = False):
+            async with backfill_lock:
+                if not posted or (len(posted) < self.backfill_batch and not force):
+                    return
+                batch = posted[:]
+                # Dropped only once stored: a failed batch is retried by the next or the final backfill
+                await self.record_posts(batch)
+                del posted[:len(batch)]
+
+        async def publish_one(line_number: int, event_id: int, event: Event):
+            async with semaphore:
+                try:
+                    result = await self.publish_post(event_id, event)
+                except Exception as e:
+                    logger.error(f"Ошибка при публикации импортированного события {event_id}: {e}")
+                    report.publish_errors.append((line_number, f"не удалось опубликовать: {e}"))
+                    failed.append(event_id)
+                    return
+                for chat_id, error in result.failed:
+                    report.publish_errors.append((line_number, f"не удалось опубликовать в {chat_id}: {error}"))
+                if not result.posted:
+                    failed.append(event_id)
+                    return
+                report.published += 1
+                posted.extend((event_id, chat_id, message_id) for chat_id, message_id in result.posted)
+            try:
+                await backfill()
+            except Exception as e:
+                logger.error(f"Не удалось сохранить посты импортированных событий, повтор позже: {e}")
+
+        try:
+            await asyncio.gather(*(publish_one(*inserted) for inserted in report.inserted))
+        finally:
+            # Posts already in the channels must be recorded even if the import is cancelled,
+            # otherwise deleting, counters and archiving can never reach them
+            await backfill(force=True)
+        if failed:
+            if self.on_removed is not None:
+                self.on_removed(failed)
+            async with self.database.write() as db:
+                await db.executemany("DELETE FROM events WHERE event_id = ?", [(event_id,) for event_id in failed])
+        logger.info(f"Published {report.published} imported events, {len(failed)} failed")
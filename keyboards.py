@@ -0,0 +1,84 @@
+import logging
+from datetime import date as date_type, datetime, timedelta
+from functools import cache, lru_cache
+from typing import Optional
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_CACHE_SIZE = 24
+
+# Клавиатуры ниже кэшируются и отдаются всем одними и теми же объектами — не изменяйте их после получения
+
+@cache
+def start_keyboard() -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text="📅 Создать событие"), KeyboardButton(text="📋 Посмотреть события")]
+        ],
+        resize_keyboard=True,
+        one_time_keyboard=False
+    )
+
+_calendar_day: Optional[date_type] = None
+
+def create_calendar(year: int, month: int) -> InlineKeyboardMarkup:
+    global _calendar_day
+    today = date_type.today()
+    if today != _calendar_day:
+        # После полуночи отметка [сегодня] переезжает, старые месяцы больше не нужны
+        _build_calendar.cache_clear()
+        _calendar_day = today
+    return _build_calendar(year, month, today)
+
+@lru_cache(maxsize=CALENDAR_CACHE_SIZE)
+def _build_calendar(year: int, month: int, today: date_type) -> InlineKeyboardMarkup:
+    buttons = []
+    buttons.append([
+        InlineKeyboardButton(text=f"{datetime(year, month, 1).strftime('%B %Y')}", callback_data="ignore"),
+        InlineKeyboardButton(text="⬅️", callback_data=f"calendar_prev_{year}_{month}"),
+        InlineKeyboardButton(text="➡️", callback_data=f"calendar_next_{year}_{month}")
+    ])
+    buttons.append([
+        InlineKeyboardButton(text=day, callback_data="ignore") for day in ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+    ])
+    first_day = datetime(year, month, 1)
+    last_day = (datetime(year, month + 1, 1) - timedelta(days=1) if month < 12 else datetime(year + 1, 1, 1) - timedelta(days=1)).day
+    weekday = first_day.weekday()
+    week = []
+    for _ in range(weekday):
+        week.append(InlineKeyboardButton(text=" ", callback_data="ignore"))
+    for day in range(1, last_day + 1):
+        date = datetime(year, month, day)
+        text = f"[{day}]" if date.date() == today else str(day)
+        week.append(InlineKeyboardButton(text=text, callback_data=f"date_{year}_{month}_{day}"))
+        if len(week) == 7:
+            buttons.append(week)
+            week = []
+    if week:
+        while len(week) < 7:
+            week.append(InlineKeyboardButton(text=" ", callback_data="ignore"))
+        buttons.append(week)
+    buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_calendar")])
+    logger.debug(f"Generated calendar for {year}-{month}: {len(buttons)} rows")
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+@cache
+def create_time_keyboard() -> InlineKeyboardMarkup:
+    buttons = []
+    for hour in range(6, 24):  # From 6:00 to 23:30
+        row = []
+        for minute in [0, 30]:
+            time_str = f"{hour:02d}:{minute:02d}"
+            row.append(InlineKeyboardButton(text=time_str, callback_data=f"time_{time_str}"))
+        buttons.append(row)
+    for hour in range(0, 4):  # From 00:00 to 03:30
+        row = []
+        for minute in [0, 30]:
+            time_str = f"{hour:02d}:{minute:02d}"
+            row.append(InlineKeyboardButton(text=time_str, callback_data=f"time_{time_str}"))
+        buttons.append(row)
+    buttons.append([InlineKeyboardButton(text="✍️ Ввести своё время", callback_data="custom_time")])
+    buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_time")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -1,84 +1,364 @@
 import aiosqlite
+import argparse
+import asyncio
+import functools
+import io
 import logging
-from datetime import datetime, timedelta
-from dateutil import parser
+import os
+from datetime import datetime
 from aiogram import Bot, Router, F, Dispatcher
 from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton
-from pydantic import BaseModel, field_validator
+from aiogram.types import (
+    Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, InlineQuery, InlineQueryResultArticle,
+    InputTextMessageContent
+)
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
 from typing import Optional
+from db import Database
+from votes import VoteWriter
+from rosters import RosterCache, RosterCSVFile
+from post_counters import PostCounterUpdater
+from migrations import Migration, migrate
+from publisher import Publisher, PublishResult
+from throttle import CallbackThrottleMiddleware
+from outbound import OutboundScheduler, Priority, outbound_priority
+from keyboards import start_keyboard, create_calendar, create_time_keyboard
+from models import Event, date_to_timestamp
+from webhook import create_app, run_webhook
+from fsm_storage import SQLiteStorage
+from reminders import ReminderScheduler
+from archive import EventArchiver
+from importer import EventImporter, import_format, read_rows
+from search import FTS_TEXT_SQL, search_events
+from metrics import MetricsDumper, MetricsMiddleware, RequestMetricsMiddleware, bot_metrics
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-BOT_TOKEN = ""
-CHANNEL_ID = ""
+BOT_TOKEN = os.getenv("BOT_TOKEN", "")
+CHANNEL_ID = os.getenv("CHANNEL_ID", "")
+# Каналы и группы для публикации через запятую; по умолчанию только CHANNEL_ID
+CHANNEL_IDS = [chat_id.strip() for chat_id in os.getenv("CHANNEL_IDS", CHANNEL_ID).split(",") if chat_id.strip()]
 ALLOWED_IDS = []
+BOT_API_URL = os.getenv("BOT_API_URL")  # свой или тестовый Bot API сервер, например http://localhost:8081
+RUN_MODE = os.getenv("RUN_MODE", "polling")  # polling или webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # публичный адрес, который регистрируется в Telegram
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1"))
+DB_PATH = os.getenv("DB_PATH", "events.db")
+DB_READERS = 4
+VOTE_FLUSH_INTERVAL = 0.05  # секунды
+VOTE_BATCH_SIZE = 500
+ROSTER_CACHE_EVENTS = 256
+ROSTER_CACHE_MEMBERS = 200_000
+LIVE_COUNTERS = True  # счётчики на кнопках поста вместо ответа на каждый голос
+POST_EDIT_INTERVAL = 3.0  # не чаще одного редактирования поста за это время, секунды
+API_GLOBAL_RATE = 30.0  # запросов в секунду на всего бота
+API_PRIVATE_CHAT_RATE = 1.0  # сообщений в секунду в личный чат
+API_GROUP_CHAT_RATE = 20 / 60  # сообщений в секунду в группу или канал
+API_ANSWER_RATE = 100.0  # ответов на нажатия и inline-запросы в секунду, сверх API_GLOBAL_RATE
+API_QUEUE_AGING = 2.0  # через столько секунд ожидания запрос поднимается на один приоритет
+API_MAX_RETRIES = 3
+EVENTS_PAGE_SIZE = 10
+SEARCH_RESULTS = 10  # результатов /find
+INLINE_RESULTS = 20  # результатов на страницу inline-режима (максимум Telegram — 50)
+ROSTER_PAGE_SIZE = 30  # участников на странице; 30 длинных имён плюс описание укладываются в 4096 символов
+FSM_SESSION_TTL = 24 * 3600  # незавершённый мастер создания события живёт сутки, секунды
+REMINDER_OFFSETS = (24 * 3600, 3600)  # за сколько секунд до события напоминать участникам
+REMINDER_CONCURRENCY = 10
+ARCHIVE_AFTER = 6 * 3600  # через сколько секунд после начала событие уходит в архив
+ARCHIVE_INTERVAL = 3600
+ARCHIVE_CLOSE_POSTS = True  # заменить кнопки поста в канале на «Событие завершено»
+# В режиме polling метрики периодически пишутся в этот файл. С --workers N у каждого воркера свой реестр:
+# /metrics на общем порту отключён, воркер i пишет в <имя>.worker<i><расширение> с меткой worker
+# (например, bot.prom → bot.worker0.prom, ... для textfile collector node_exporter)
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_DUMP_INTERVAL = 60  # секунды
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024  # больше Bot API не даёт скачать
+IMPORT_CONCURRENCY = 4  # постов импорта в очереди на отправку одновременно
+PUBLISH_CONCURRENCY = 5  # чатов, в которые пост отправляется одновременно
+# Нажатий кнопок в секунду и запас на пользователя, по префиксу callback_data
+CALLBACK_LIMITS = {
+    "join": (0.5, 3),
+    "decline": (0.5, 3),
+    "view": (0.5, 3),  # каждое нажатие — новое сообщение
+    "roster": (2.0, 5),
+    "calendar": (2.0, 5),
+    "export": (1 / 30, 1),  # выгрузка читает весь состав
+}
+CALLBACK_DEFAULT_LIMIT = (5.0, 10)
+CALLBACK_THROTTLE_BUCKETS = 50_000
 
-bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN))
+bot = Bot(
+    token=BOT_TOKEN,
+    session=AiohttpSession(api=TelegramAPIServer.from_base(BOT_API_URL)) if BOT_API_URL else None,
+    default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
+)
+outbound = OutboundScheduler(
+    global_rate=API_GLOBAL_RATE,
+    private_chat_rate=API_PRIVATE_CHAT_RATE,
+    group_chat_rate=API_GROUP_CHAT_RATE,
+    answer_rate=API_ANSWER_RATE,
+    aging=API_QUEUE_AGING,
+    max_retries=API_MAX_RETRIES,
+)
+bot.session.middleware(outbound)
+metrics = bot_metrics()
+# После outbound: время самого запроса к API, без ожидания в очереди
+bot.session.middleware(RequestMetricsMiddleware(metrics))
+metrics_middleware = MetricsMiddleware(metrics)
 router = Router()
+router.message.middleware(metrics_middleware)
+router.callback_query.middleware(metrics_middleware)
+router.inline_query.middleware(metrics_middleware)
+callback_throttle = CallbackThrottleMiddleware(
+    CALLBACK_LIMITS, default_limit=CALLBACK_DEFAULT_LIMIT, max_buckets=CALLBACK_THROTTLE_BUCKETS,
+    throttled_text="⏳ Слишком часто, подождите немного."
+)
+# Внешний: лишние нажатия отбрасываются до фильтров и обработчиков
+router.callback_query.outer_middleware(callback_throttle)
+database = Database(DB_PATH, readers=DB_READERS, on_query=metrics.observe_query)
+vote_writer = VoteWriter(database, flush_interval=VOTE_FLUSH_INTERVAL, max_batch=VOTE_BATCH_SIZE)
+roster_cache = RosterCache(database, vote_writer, max_events=ROSTER_CACHE_EVENTS, max_members=ROSTER_CACHE_MEMBERS)
+fsm_storage = SQLiteStorage(database, session_ttl=FSM_SESSION_TTL)
+reminder_scheduler = ReminderScheduler(
+    bot, database, offsets=REMINDER_OFFSETS, vote_writer=vote_writer, concurrency=REMINDER_CONCURRENCY
+)
+publisher = Publisher(bot, database, CHANNEL_IDS, concurrency=PUBLISH_CONCURRENCY)
 
-class Event(BaseModel):
-    title: str
-    description: str
-    date: str
-    image_id: Optional[str] = None
-
-    @field_validator("title")
-    def validate_title(cls, value):
-        if len(value) > 100:
-            raise ValueError("Название события не должно превышать 100 символов")
-        if len(value.strip()) == 0:
-            raise ValueError("Название события не может быть пустым")
-        return value
-
-    @field_validator("description")
-    def validate_description(cls, value):
-        if len(value) > 1000:
-            raise ValueError("Описание события не должно превышать 1000 символов")
-        if len(value.strip()) == 0:
-            raise ValueError("Описание события не может быть пустым")
-        return value
-
-    @field_validator("date")
-    def validate_date(cls, value):
+def forget_events(event_ids: list[int]):
+    for event_id in event_ids:
+        roster_cache.invalidate(event_id)
+        reminder_scheduler.cancel_event(event_id)
+        publisher.forget(event_id)
+
+archiver = EventArchiver(
+    bot, database, vote_writer=vote_writer, on_archived=forget_events,
+    archive_after=ARCHIVE_AFTER, interval=ARCHIVE_INTERVAL, close_posts=ARCHIVE_CLOSE_POSTS
+)
+
+def collect_metrics():
+    yield "bot_db_commits_total", "counter", "Committed write transactions", {}, database.commits
+    yield "bot_vote_batches_total", "counter", "Vote batches written", {}, vote_writer.commits
+    yield "bot_votes_written_total", "counter", "Votes written to the database", {}, vote_writer.rows_written
+    yield "bot_roster_cache_lookups_total", "counter", "Roster cache lookups", {"result": "hit"}, roster_cache.hits
+    yield "bot_roster_cache_lookups_total", "counter", "Roster cache lookups", {"result": "miss"}, roster_cache.misses
+    yield "bot_post_counter_edits_total", "counter", "Channel post counter edits", {}, post_counters.edits
+    stats = outbound.stats()
+    for result in ("sent", "retries", "failed"):
+        yield "bot_outbound_requests_total", "counter", "Requests through the outbound queue", {"result": result}, stats[result]
+    yield "bot_outbound_queue_depth", "gauge", "Requests waiting in the outbound queue", {}, stats["depth"]
+    yield "bot_reminders_total", "counter", "Reminder messages", {"result": "sent"}, reminder_scheduler.sent
+    yield "bot_reminders_total", "counter", "Reminder messages", {"result": "failed"}, reminder_scheduler.failed
+    yield "bot_callbacks_dropped_total", "counter", "Button presses dropped", {"reason": "duplicate"}, callback_throttle.duplicates
+    yield "bot_callbacks_dropped_total", "counter", "Button presses dropped", {"reason": "throttled"}, callback_throttle.throttled
+    yield "bot_archived_events_total", "counter", "Events moved to the archive", {}, archiver.archived
+
+metrics.collector(collect_metrics)
+
+async def create_tables(db):
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            date TEXT NOT NULL,
+            image_id TEXT,
+            message_id INTEGER,
+            date_ts INTEGER,
+            UNIQUE(title, date)
+        )
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS participants (
+            event_id INTEGER,
+            user_id INTEGER,
+            username TEXT,
+            participation_status TEXT,
+            PRIMARY KEY (event_id, user_id),
+            FOREIGN KEY (event_id) REFERENCES events (event_id) ON DELETE CASCADE
+        )
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS fsm_state (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    await db.execute('CREATE INDEX IF NOT EXISTS idx_fsm_state_updated_at ON fsm_state(updated_at)')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS reminders_sent (
+            event_id INTEGER,
+            offset_seconds INTEGER,
+            user_id INTEGER,
+            sent_at INTEGER NOT NULL,
+            PRIMARY KEY (event_id, offset_seconds, user_id),
+            FOREIGN KEY (event_id) REFERENCES events (event_id) ON DELETE CASCADE
+        )
+    ''')
+
+async def add_event_timestamps(db):
+    cursor = await db.execute("PRAGMA table_info(events)")
+    if "date_ts" not in [column[1] for column in await cursor.fetchall()]:
+        # date хранится строкой ДД.ММ.ГГГГ ЧЧ:ММ, для сортировки и диапазонов нужен timestamp
+        await db.execute("ALTER TABLE events ADD COLUMN date_ts INTEGER")
+    cursor = await db.execute("SELECT event_id, date FROM events WHERE date_ts IS NULL")
+    backfill = []
+    for event_id, date in await cursor.fetchall():
         try:
-            parsed_date = parser.parse(value, dayfirst=True)
-            if parsed_date < datetime.now():
-                raise ValueError("Дата события должна быть в будущем")
-            return value
-        except ValueError:
-            raise ValueError("Неверный формат даты. Используйте ДД.ММ.ГГГГ ЧЧ:ММ")
+            backfill.append((date_to_timestamp(date), event_id))
+        except (ValueError, OverflowError) as e:
+            logger.error(f"Не удалось разобрать дату события {event_id} ({date}): {e}")
+    await db.executemany("UPDATE events SET date_ts = ? WHERE event_id = ?", backfill)
+    await db.execute('CREATE INDEX IF NOT EXISTS idx_events_date_ts ON events(date_ts, event_id)')
 
-async def init_db():
-    async with aiosqlite.connect("events.db") as db:
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS events (
-                event_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT NOT NULL,
-                date TEXT NOT NULL,
-                image_id TEXT,
-                message_id INTEGER,
-                UNIQUE(title, date)
+async def add_event_title_date_index(db):
+    # В старых базах таблица events создана без UNIQUE(title, date), и в ней могут быть дубликаты.
+    # Остаётся событие с меньшим event_id, к названию остальных добавляется их номер — участники и посты сохраняются
+    cursor = await db.execute(
+        "SELECT event_id, title, date FROM events AS e WHERE EXISTS ("
+        "SELECT 1 FROM events AS first WHERE first.title = e.title AND first.date = e.date "
+        "AND first.event_id < e.event_id)"
+    )
+    for event_id, title, date in await cursor.fetchall():
+        new_title = f"{title} (#{event_id})"
+        logger.warning(f"Дубликат события «{title}» на {date}: событие {event_id} переименовано в «{new_title}»")
+        await db.execute("UPDATE events SET title = ? WHERE event_id = ?", (new_title, event_id))
+    await db.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_events_title_date ON events(title, date)')
+
+async def add_participants_status_index(db):
+    # Страницы состава: WHERE event_id = ? AND participation_status = ? ORDER BY user_id
+    await db.execute(
+        'CREATE INDEX IF NOT EXISTS idx_participants_event_status ON participants(event_id, participation_status, user_id)'
+    )
+    # Поиск по event_id покрывают первичный ключ и индекс выше, отдельный индекс только замедляет запись голосов
+    await db.execute('DROP INDEX IF EXISTS idx_participants_event_id')
+
+async def create_archive_tables(db):
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS events_archive (
+            event_id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            date TEXT NOT NULL,
+            image_id TEXT,
+            message_id INTEGER,
+            date_ts INTEGER,
+            archived_at INTEGER NOT NULL
+        )
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS participants_archive (
+            event_id INTEGER,
+            user_id INTEGER,
+            username TEXT,
+            participation_status TEXT,
+            PRIMARY KEY (event_id, user_id)
+        )
+    ''')
+
+async def create_search_index(db):
+    # Полнотекстовый поиск: FTS5 с внешним содержимым, индекс поддерживается триггерами.
+    # В индекс пишется текст с Ё → Е, поэтому 'rebuild' использовать нельзя — только INSERT ... SELECT ниже
+    for table in ("events", "events_archive"):
+        fts = f"{table}_fts"
+        cursor = await db.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,))
+        created = await cursor.fetchone() is None
+        await db.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                title, description, content='{table}', content_rowid='event_id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
             )
         ''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS participants (
-                event_id INTEGER,
-                user_id INTEGER,
-                username TEXT,
-                participation_status TEXT,
-                PRIMARY KEY (event_id, user_id),
-                FOREIGN KEY (event_id) REFERENCES events (event_id) ON DELETE CASCADE
-            )
+        new_values = f"new.event_id, {FTS_TEXT_SQL.format('new.title')}, {FTS_TEXT_SQL.format('new.description')}"
+        old_values = f"old.event_id, {FTS_TEXT_SQL.format('old.title')}, {FTS_TEXT_SQL.format('old.description')}"
+        await db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, title, description) VALUES ({new_values});
+            END
+        ''')
+        await db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, title, description) VALUES ('delete', {old_values});
+            END
         ''')
-        await db.execute('CREATE INDEX IF NOT EXISTS idx_participants_event_id ON participants(event_id)')
-        await db.commit()
+        await db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF title, description ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, title, description) VALUES ('delete', {old_values});
+                INSERT INTO {fts} (rowid, title, description) VALUES ({new_values});
+            END
+        ''')
+        if created:
+            # Название весит больше описания
+            await db.execute(f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')")
+            await db.execute(
+                f"INSERT INTO {fts} (rowid, title, description) SELECT event_id, "
+                f"{FTS_TEXT_SQL.format('title')}, {FTS_TEXT_SQL.format('description')} FROM {table}"
+            )
+
+async def create_publications(db):
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS publications (
+            event_id INTEGER,
+            chat_id INTEGER,
+            message_id INTEGER NOT NULL,
+            PRIMARY KEY (event_id, chat_id),
+            FOREIGN KEY (event_id) REFERENCES events (event_id) ON DELETE CASCADE
+        )
+    ''')
+
+async def add_legacy_posts_index(db):
+    # Частичный индекс пуст, как только старые посты перенесены, и проверка при запуске — одно чтение
+    await db.execute('CREATE INDEX IF NOT EXISTS idx_events_legacy_post ON events(event_id) WHERE message_id IS NOT NULL')
+
+# Схема базы: шаги применяются по порядку, каждый один раз. Существующие шаги не меняются —
+# новые таблицы, индексы и столбцы добавляются новым шагом в конец списка.
+# Шаги 1–7 повторяют прежний init_db и поэтому идемпотентны: базы, созданные до миграций, проходят их без потерь
+MIGRATIONS: list[Migration] = [
+    (1, "events, participants, fsm_state, reminders_sent", create_tables),
+    (2, "events.date_ts with backfill and index", add_event_timestamps),
+    (3, "unique index on events(title, date)", add_event_title_date_index),
+    (4, "participants(event_id, participation_status, user_id) index", add_participants_status_index),
+    (5, "events_archive, participants_archive", create_archive_tables),
+    (6, "full-text search over events and the archive", create_search_index),
+    (7, "publications", create_publications),
+    (8, "partial index on events with a legacy message_id", add_legacy_posts_index),
+]
+
+async def backfill_publications():
+    # Раньше пост публиковался только в CHANNEL_ID, и его id хранился в events.message_id.
+    # Перенос зависит от окружения, поэтому это не шаг миграции; перенесённый message_id обнуляется,
+    # так что каждый пост переносится один раз, даже если CHANNEL_ID потом сменится
+    if await database.fetchone("SELECT 1 FROM events WHERE message_id IS NOT NULL LIMIT 1") is None:
+        return
+    if not CHANNEL_ID:
+        logger.warning("В events есть посты без записи в publications, для их переноса нужен CHANNEL_ID")
+        return
+    async with database.write() as db:
+        cursor = await db.execute(
+            "INSERT OR IGNORE INTO publications (event_id, chat_id, message_id) "
+            "SELECT event_id, ?, message_id FROM events WHERE message_id IS NOT NULL "
+            "AND NOT EXISTS (SELECT 1 FROM publications WHERE publications.event_id = events.event_id)",
+            (int(CHANNEL_ID) if CHANNEL_ID.lstrip("-").isdigit() else CHANNEL_ID,)
+        )
+        logger.info(f"Перенесено постов из events.message_id в publications: {cursor.rowcount}")
+        await db.execute("UPDATE events SET message_id = NULL WHERE message_id IS NOT NULL")
+
+async def init_db():
+    await migrate(database, MIGRATIONS)
+    await backfill_publications()
 
 class EventCreation(StatesGroup):
     TITLE = State()
@@ -91,64 +371,77 @@ class EventCreation(StatesGroup):
 def check_access(user_id: int) -> bool:
     return user_id in ALLOWED_IDS
 
-def start_keyboard() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="📅 Создать событие"), KeyboardButton(text="📋 Посмотреть события")]
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=False
-    )
+def event_keyboard(event_id: int, joined: Optional[int] = None, declined: Optional[int] = None) -> InlineKeyboardMarkup:
+    join_text, decline_text = "✅ Учавствую", "❌ Учавствую"
+    if joined is not None:
+        join_text += f" ({joined})"
+    if declined is not None:
+        decline_text += f" ({declined})"
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text=join_text, callback_data=f"join_{event_id}"),
+        InlineKeyboardButton(text=decline_text, callback_data=f"decline_{event_id}")
+    ]])
 
-def create_calendar(year: int, month: int) -> InlineKeyboardMarkup:
-    buttons = []
-    today = datetime.now()
-    buttons.append([
-        InlineKeyboardButton(text=f"{datetime(year, month, 1).strftime('%B %Y')}", callback_data="ignore"),
-        InlineKeyboardButton(text="⬅️", callback_data=f"calendar_prev_{year}_{month}"),
-        InlineKeyboardButton(text="➡️", callback_data=f"calendar_next_{year}_{month}")
-    ])
-    buttons.append([
-        InlineKeyboardButton(text=day, callback_data="ignore") for day in ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-    ])
-    first_day = datetime(year, month, 1)
-    last_day = (datetime(year, month + 1, 1) - timedelta(days=1) if month < 12 else datetime(year + 1, 1, 1) - timedelta(days=1)).day
-    weekday = first_day.weekday()
-    week = []
-    for _ in range(weekday):
-        week.append(InlineKeyboardButton(text=" ", callback_data="ignore"))
-    for day in range(1, last_day + 1):
-        date = datetime(year, month, day)
-        text = f"[{day}]" if date.date() == today.date() else str(day)
-        week.append(InlineKeyboardButton(text=text, callback_data=f"date_{year}_{month}_{day}"))
-        if len(week) == 7:
-            buttons.append(week)
-            week = []
-    if week:
-        while len(week) < 7:
-            week.append(InlineKeyboardButton(text=" ", callback_data="ignore"))
-        buttons.append(week)
-    buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_calendar")])
-    logger.info(f"Generated calendar for {year}-{month}: {len(buttons)} rows")
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+async def counted_event_keyboard(event_id: int) -> Optional[InlineKeyboardMarkup]:
+    counts = await roster_cache.counts(event_id)
+    if counts is None:
+        return None
+    return event_keyboard(event_id, counts["Участвую"], counts["Не участвую"])
 
-def create_time_keyboard() -> InlineKeyboardMarkup:
-    buttons = []
-    for hour in range(6, 24):  # From 6:00 to 23:30
-        row = []
-        for minute in [0, 30]:
-            time_str = f"{hour:02d}:{minute:02d}"
-            row.append(InlineKeyboardButton(text=time_str, callback_data=f"time_{time_str}"))
-        buttons.append(row)
-    for hour in range(0, 4):  # From 00:00 to 03:30
-        row = []
-        for minute in [0, 30]:
-            time_str = f"{hour:02d}:{minute:02d}"
-            row.append(InlineKeyboardButton(text=time_str, callback_data=f"time_{time_str}"))
-        buttons.append(row)
-    buttons.append([InlineKeyboardButton(text="✍️ Ввести своё время", callback_data="custom_time")])
-    buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_time")])
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
+post_counters = PostCounterUpdater(bot, counted_event_keyboard, interval=POST_EDIT_INTERVAL)
+
+async def show_wizard_step(state: FSMContext, key: str, chat_id: int, message_id: Optional[int], text: str,
+                           reply_markup: Optional[InlineKeyboardMarkup] = None):
+    # Шаг мастера редактирует одно и то же сообщение; новое отправляется, только если править нечего или нельзя
+    if message_id is not None:
+        try:
+            await bot.edit_message_text(text=text, chat_id=chat_id, message_id=message_id, reply_markup=reply_markup)
+            await state.update_data(**{key: message_id})
+            return
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                await state.update_data(**{key: message_id})
+                return
+            logger.error(f"Не удалось отредактировать сообщение мастера: {e}")
+    new_message = await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+    await state.update_data(**{key: new_message.message_id})
+    if message_id is not None:
+        try:
+            await bot.delete_message(chat_id, message_id)
+        except Exception as delete_error:
+            logger.error(f"Failed to delete old wizard message: {delete_error}")
+
+def event_post_text(event: Event) -> str:
+    # Format title as bold and italic
+    text = f"📅 **_{event.title}_**\n\n{event.description}\n\n🕒 **Дата и время**: {event.date}"
+    if len(text) > 1024 and event.image_id:
+        raise ValueError("Текст подписи к изображению слишком длинный (макс. 1024 символа).")
+    if len(text) > 4096 and not event.image_id:
+        raise ValueError("Текст сообщения слишком длинный (макс. 4096 символов).")
+    return text
+
+async def publish_event(event_id: int, event: Event, priority: Priority = Priority.NOTIFICATION,
+                        record: bool = True) -> PublishResult:
+    keyboard = event_keyboard(event_id, 0, 0) if LIVE_COUNTERS else event_keyboard(event_id)
+    text = event_post_text(event)
+
+    async def send(chat_id) -> Message:
+        with outbound_priority(priority):
+            if event.image_id:
+                return await bot.send_photo(chat_id=chat_id, photo=event.image_id, caption=text, reply_markup=keyboard)
+            return await bot.send_message(chat_id=chat_id, text=text, reply_markup=keyboard)
+
+    return await publisher.publish(event_id, send, record=record)
+
+def remember_event(event_id: int, event: Event):
+    roster_cache.add_event(event_id)
+    reminder_scheduler.schedule_event(event_id, date_to_timestamp(event.date))
+
+importer = EventImporter(
+    database, event_post_text, functools.partial(publish_event, priority=Priority.BULK, record=False),
+    record_posts=publisher.record, on_inserted=remember_event, on_removed=forget_events, concurrency=IMPORT_CONCURRENCY
+)
+import_tasks: set[asyncio.Task] = set()
 
 @router.message(CommandStart())
 async def start_command(message: Message):
@@ -170,6 +463,100 @@ async def cancel_command(message: Message, state: FSMContext):
     await state.clear()
     await message.reply("✅ Процесс создания события отменён.", reply_markup=start_keyboard())
 
+@router.message(Command("import"))
+async def import_command(message: Message):
+    if not check_access(message.from_user.id):
+        await message.reply("🚫 Доступ запрещён.")
+        return
+    document = message.document or (message.reply_to_message.document if message.reply_to_message else None)
+    if document is None:
+        await message.reply(
+            "📥 Отправьте файл .csv или .jsonl с подписью /import.\n"
+            "Поля: title, description, date (ДД.ММ.ГГГГ ЧЧ:ММ), image\\_id (необязательно)."
+        )
+        return
+    try:
+        fmt = import_format(document.file_name)
+        if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+            raise ValueError("Файл больше 20 МБ")
+        buffer = await bot.download(document)
+        with io.TextIOWrapper(buffer, encoding="utf-8-sig", newline="") as stream:
+            report = await importer.insert(read_rows(stream, fmt))
+    except UnicodeDecodeError:
+        await message.reply("❌ Ошибка: файл должен быть в кодировке UTF-8.")
+        return
+    except ValueError as e:
+        await message.reply(f"❌ Ошибка: {e}.")
+        return
+    if not report.inserted:
+        await message.reply(report.summary())
+        return
+    await message.reply(report.summary() + "\n\n⏳ Публикую события в канале, это может занять время…")
+
+    async def finish_import():
+        # Канал принимает ~20 постов в минуту, поэтому публикация идёт в фоне
+        try:
+            await importer.publish(report)
+            summary = report.summary()
+        except Exception as e:
+            logger.error(f"Ошибка при публикации импортированных событий: {e}", exc_info=True)
+            summary = (report.summary() + "\n\n❌ Публикация прервана из-за ошибки, подробности в логе. "
+                       "Неопубликованные события остались в базе.")
+        try:
+            await message.reply(summary)
+        except Exception as e:
+            logger.error(f"Не удалось отправить отчёт об импорте: {e}", exc_info=True)
+
+    task = asyncio.create_task(finish_import())
+    import_tasks.add(task)
+    task.add_done_callback(import_tasks.discard)
+
+@router.message(Command("find"))
+async def find_command(message: Message):
+    if not check_access(message.from_user.id):
+        await message.reply("🚫 Доступ запрещён.")
+        return
+    query = (message.text or message.caption or "").partition(" ")[2].strip()
+    if not query:
+        await message.reply("🔎 Напишите, что искать: /find турнир")
+        return
+    rows = await search_events(database, query, limit=SEARCH_RESULTS)
+    if not rows:
+        await message.reply("🔎 Ничего не найдено.")
+        return
+    buttons = [
+        [InlineKeyboardButton(text=f"📅 {title} ({date})", callback_data=f"view_{event_id}")]
+        for event_id, title, _, date, archived in rows if not archived
+    ]
+    archived_text = "\n".join(
+        f"🗄 {title} ({date})".replace("_", "\\_").replace("*", "\\*").replace("`", "\\`")
+        for _, title, _, date, archived in rows if archived
+    )
+    text = "🔎 **Найденные события**:"
+    if archived_text:
+        text += f"\n\n**В архиве**:\n{archived_text}"
+    await message.reply(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons))
+
+# Inline-режим нужно включить у @BotFather (/setinline)
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery):
+    offset = int(inline_query.offset or 0)
+    rows = await search_events(database, inline_query.query, limit=INLINE_RESULTS, offset=offset)
+    results = [
+        InlineQueryResultArticle(
+            id=f"{'a' if archived else 'e'}{event_id}",
+            title=title,
+            description=f"🕒 {date}" + (" · в архиве" if archived else ""),
+            input_message_content=InputTextMessageContent(
+                message_text=event_post_text(Event.model_construct(title=title, description=description, date=date))
+            ),
+        )
+        for event_id, title, description, date, archived in rows
+    ]
+    await inline_query.answer(
+        results, cache_time=30, next_offset=str(offset + INLINE_RESULTS) if len(rows) == INLINE_RESULTS else ""
+    )
+
 @router.callback_query(F.data.in_(["cancel_calendar", "cancel_time"]))
 async def cancel_calendar_time(callback: CallbackQuery, state: FSMContext):
     await state.clear()
@@ -194,8 +581,7 @@ async def process_action(message: Message, state: FSMContext):
 @router.message(EventCreation.TITLE)
 async def process_title(message: Message, state: FSMContext):
     try:
-        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%d.%m.%Y %H:%M")
-        Event(title=message.text, description="test", date=tomorrow)  # Валидация с будущей датой
+        Event.validate_field("title", message.text)
         await state.update_data(title=message.text.strip())
         await state.set_state(EventCreation.DESCRIPTION)
         await message.reply("📝 Введите описание события (до 1000 символов):")
@@ -206,15 +592,15 @@ async def process_title(message: Message, state: FSMContext):
 @router.message(EventCreation.DESCRIPTION)
 async def process_description(message: Message, state: FSMContext):
     try:
-        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%d.%m.%Y %H:%M")
-        Event(description=message.text, title="test", date=tomorrow)  # Валидация с будущей датой
+        Event.validate_field("description", message.text)
         await state.update_data(description=message.text.strip())
         await state.set_state(EventCreation.DATE)
         current_date = datetime.now()
-        await message.reply(
+        calendar_message = await message.reply(
             "📅 Выберите дату события:",
             reply_markup=create_calendar(current_date.year, current_date.month)
         )
+        await state.update_data(calendar_message_id=calendar_message.message_id)
     except ValueError as e:
         error_msg = str(e).replace("_", "\\_").replace("*", "\\*").replace("`", "\\`")
         await message.reply(f"❌ Ошибка: {error_msg}. Попробуйте снова.")
@@ -246,17 +632,10 @@ async def process_calendar_navigation(callback: CallbackQuery, state: FSMContext
         new_calendar = create_calendar(year, month)
         calendar_text = f"📅 Выберите дату события ({datetime(year, month, 1).strftime('%B %Y')}):"
 
-        new_message = await callback.message.answer(
-            text=calendar_text,
-            reply_markup=new_calendar
+        await show_wizard_step(
+            state, "calendar_message_id", callback.message.chat.id, callback.message.message_id,
+            calendar_text, new_calendar
         )
-        await state.update_data(calendar_message_id=new_message.message_id)
-        await asyncio.sleep(0.1)
-        try:
-            await callback.message.delete()
-        except Exception as delete_error:
-            logger.error(f"Failed to delete old calendar message: {delete_error}")
-
         await callback.answer()
     except Exception as e:
         logger.error(f"Ошибка при навигации календаря: {e}")
@@ -280,16 +659,11 @@ async def process_date_callback(callback: CallbackQuery, state: FSMContext):
             raise ValueError(f"Ошибка в формате даты: {str(ve)}")
         await state.update_data(date=date_str)
         await state.set_state(EventCreation.TIME)
-        new_message = await callback.message.answer(
-            text="🕒 Выберите время события (6:00–3:00, интервал 30 минут) или нажмите 'Ввести своё время' (например, 17:33):",
-            reply_markup=create_time_keyboard()
+        await show_wizard_step(
+            state, "time_message_id", callback.message.chat.id, callback.message.message_id,
+            "🕒 Выберите время события (6:00–3:00, интервал 30 минут) или нажмите 'Ввести своё время' (например, 17:33):",
+            create_time_keyboard()
         )
-        await state.update_data(time_message_id=new_message.message_id)
-        await asyncio.sleep(0.1)
-        try:
-            await callback.message.delete()
-        except Exception as delete_error:
-            logger.error(f"Failed to delete old calendar message: {delete_error}")
         await callback.answer()
     except Exception as e:
         logger.error(f"Ошибка при выборе даты: {e}")
@@ -304,18 +678,13 @@ async def process_time_callback(callback: CallbackQuery, state: FSMContext):
         data = await state.get_data()
         date_str = data["date"]
         full_date = f"{date_str} {time_str}"
-        Event(date=full_date, title="test", description="test")  # Валидация
+        Event.validate_field("date", full_date)
         await state.update_data(date=full_date)
         await state.set_state(EventCreation.IMAGE)
-        new_message = await callback.message.answer(
-            text="🖼 Загрузите изображение для события (или отправьте /skip, чтобы пропустить):"
+        await show_wizard_step(
+            state, "image_message_id", callback.message.chat.id, callback.message.message_id,
+            "🖼 Загрузите изображение для события (или отправьте /skip, чтобы пропустить):"
         )
-        await state.update_data(image_message_id=new_message.message_id)
-        await asyncio.sleep(0.1)
-        try:
-            await callback.message.delete()
-        except Exception as delete_error:
-            logger.error(f"Failed to delete old time message: {delete_error}")
         await callback.answer()
     except ValueError as e:
         logger.error(f"Ошибка при выборе времени: {e}")
@@ -326,15 +695,10 @@ async def process_time_callback(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "custom_time", EventCreation.TIME)
 async def request_custom_time(callback: CallbackQuery, state: FSMContext):
     await state.set_state(EventCreation.CUSTOM_TIME)
-    new_message = await callback.message.answer(
-        text="✍️ Введите время события в формате ЧЧ:ММ (например, 17:33):"
+    await show_wizard_step(
+        state, "custom_time_message_id", callback.message.chat.id, callback.message.message_id,
+        "✍️ Введите время события в формате ЧЧ:ММ (например, 17:33):"
     )
-    await state.update_data(custom_time_message_id=new_message.message_id)
-    await asyncio.sleep(0.1)
-    try:
-        await callback.message.delete()
-    except Exception as delete_error:
-        logger.error(f"Failed to delete old time message: {delete_error}")
     await callback.answer()
 
 @router.message(EventCreation.CUSTOM_TIME)
@@ -345,13 +709,13 @@ async def process_custom_time(message: Message, state: FSMContext):
         data = await state.get_data()
         date_str = data["date"]
         full_date = f"{date_str} {time_str}"
-        Event(date=full_date, title="test", description="test")
+        Event.validate_field("date", full_date)
         await state.update_data(date=full_date)
         await state.set_state(EventCreation.IMAGE)
-        new_message = await message.answer(
-            text="🖼 Загрузите изображение для события (или отправьте /skip, чтобы пропустить):"
+        await show_wizard_step(
+            state, "image_message_id", message.chat.id, data.get("custom_time_message_id"),
+            "🖼 Загрузите изображение для события (или отправьте /skip, чтобы пропустить):"
         )
-        await state.update_data(image_message_id=new_message.message_id)
         await message.delete()
     except ValueError as e:
         logger.error(f"Ошибка при вводе кастомного времени: {e}")
@@ -378,55 +742,41 @@ async def save_event(message: Message, state: FSMContext):
     data = await state.get_data()
     try:
         event = Event(title=data["title"], description=data["description"], date=data["date"], image_id=data.get("image_id"))
-        async with aiosqlite.connect("events.db") as db:
-            try:
+        event_post_text(event)
+        try:
+            async with database.write() as db:
                 cursor = await db.execute(
-                    "INSERT INTO events (title, description, date, image_id) VALUES (?, ?, ?, ?)",
-                    (event.title, event.description, event.date, event.image_id)
+                    "INSERT INTO events (title, description, date, image_id, date_ts) VALUES (?, ?, ?, ?, ?)",
+                    (event.title, event.description, event.date, event.image_id, date_to_timestamp(event.date))
                 )
                 event_id = cursor.lastrowid
-                await db.commit()
-            except aiosqlite.IntegrityError:
-                await message.reply("❌ Событие с таким названием и датой уже существует.")
-                await state.clear()
-                return
+            remember_event(event_id, event)
+        except aiosqlite.IntegrityError:
+            await message.reply("❌ Событие с таким названием и датой уже существует.")
+            await state.clear()
+            return
 
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[[
-                InlineKeyboardButton(text="✅ Учавствую", callback_data=f"join_{event_id}"),
-                InlineKeyboardButton(text="❌ Учавствую", callback_data=f"decline_{event_id}")
-            ]])
-
-            # Format title as bold and italic
-            text = f"📅 **_{event.title}_**\n\n{event.description}\n\n🕒 **Дата и время**: {event.date}"
-            if len(text) > 1024 and event.image_id:
-                raise ValueError("Текст подписи к изображению слишком длинный (макс. 1024 символа).")
-            if len(text) > 4096 and not event.image_id:
-                raise ValueError("Текст сообщения слишком длинный (макс. 4096 символов).")
-
-            try:
-                if event.image_id:
-                    message_sent = await bot.send_photo(
-                        chat_id=CHANNEL_ID,
-                        photo=event.image_id,
-                        caption=text,
-                        reply_markup=keyboard
-                    )
-                else:
-                    message_sent = await bot.send_message(
-                        chat_id=CHANNEL_ID,
-                        text=text,
-                        reply_markup=keyboard
-                    )
-                await db.execute("UPDATE events SET message_id = ? WHERE event_id = ?", (message_sent.message_id, event_id))
-                await db.commit()
-            except Exception as e:
-                logger.error(f"Ошибка при отправке в канал: {e}")
-                await message.reply("❌ Ошибка: не удалось опубликовать событие в канал. Проверьте доступность канала.")
-                await db.execute("DELETE FROM events WHERE event_id = ?", (event_id,))
-                await db.commit()
-                return
+        try:
+            result = await publish_event(event_id, event)
+        except Exception as e:
+            logger.error(f"Ошибка при отправке в канал: {e}")
+            result = None
+        if result is None or not result.posted:
+            await message.reply("❌ Ошибка: не удалось опубликовать событие в канал. Проверьте доступность канала.")
+            forget_events([event_id])
+            await database.execute("DELETE FROM events WHERE event_id = ?", (event_id,))
+            return
 
-        await message.reply("🎉 Событие создано и опубликовано в канале!", reply_markup=start_keyboard())
+        if result.failed:
+            # Уже отправленные посты не откатываются: событие остаётся в тех чатах, куда дошло
+            failed_chats = ", ".join(str(chat_id) for chat_id, _ in result.failed)
+            await message.reply(
+                f"⚠️ Событие создано и опубликовано в {len(result.posted)} из {len(CHANNEL_IDS)} чатов. "
+                f"Не удалось опубликовать в: {failed_chats}.",
+                reply_markup=start_keyboard()
+            )
+        else:
+            await message.reply("🎉 Событие создано и опубликовано в канале!", reply_markup=start_keyboard())
         await state.clear()
     except ValueError as e:
         error_msg = str(e).replace("_", "\\_").replace("*", "\\*").replace("`", "\\`")
@@ -435,50 +785,207 @@ async def save_event(message: Message, state: FSMContext):
         logger.error(f"Ошибка при сохранении события: {e}")
         await message.reply("❌ Произошла ошибка при создании события. Попробуйте снова.")
 
-        await message.reply("🎉 Событие создано и опубликовано в канале!", reply_markup=start_keyboard())
-        await state.clear()
-    except ValueError as e:
-        error_msg = str(e).replace("_", "\\_").replace("*", "\\*").replace("`", "\\`")
-        await message.reply(f"❌ Ошибка: {error_msg}. Попробуйте снова.")
-    except Exception as e:
-        logger.error(f"Ошибка при сохранении события: {e}")
-        await message.reply("❌ Произошла ошибка при создании события. Попробуйте снова.")
+async def fetch_events_page(direction: str, cursor: Optional[tuple[int, int]], include_past: bool):
+    # Keyset-пагинация по (date_ts, event_id): каждая страница — один проход по idx_events_date_ts
+    min_ts = -2 ** 63 if include_past else int(datetime.now().timestamp())
+    if direction == "prev":
+        rows = await database.fetchall(
+            "SELECT event_id, title, date, date_ts FROM events WHERE date_ts >= ? AND (date_ts, event_id) < (?, ?) "
+            "ORDER BY date_ts DESC, event_id DESC LIMIT ?",
+            (min_ts, *cursor, EVENTS_PAGE_SIZE + 1)
+        )
+    elif direction == "next":
+        rows = await database.fetchall(
+            "SELECT event_id, title, date, date_ts FROM events WHERE date_ts >= ? AND (date_ts, event_id) > (?, ?) "
+            "ORDER BY date_ts, event_id LIMIT ?",
+            (min_ts, *cursor, EVENTS_PAGE_SIZE + 1)
+        )
+    else:
+        rows = await database.fetchall(
+            "SELECT event_id, title, date, date_ts FROM events WHERE date_ts >= ? ORDER BY date_ts, event_id LIMIT ?",
+            (min_ts, EVENTS_PAGE_SIZE + 1)
+        )
+    has_more = len(rows) > EVENTS_PAGE_SIZE
+    rows = rows[:EVENTS_PAGE_SIZE]
+    if direction == "prev":
+        rows.reverse()
+    if not rows:
+        return rows, False, False
+    if direction == "prev":
+        has_prev = has_more
+        has_next = await database.fetchone(
+            "SELECT 1 FROM events WHERE date_ts >= ? AND (date_ts, event_id) > (?, ?) LIMIT 1",
+            (min_ts, rows[-1][3], rows[-1][0])
+        ) is not None
+    else:
+        has_next = has_more
+        has_prev = direction == "next" and await database.fetchone(
+            "SELECT 1 FROM events WHERE date_ts >= ? AND (date_ts, event_id) < (?, ?) LIMIT 1",
+            (min_ts, rows[0][3], rows[0][0])
+        ) is not None
+    return rows, has_prev, has_next
+
+def events_page_keyboard(rows, has_prev: bool, has_next: bool, include_past: bool) -> InlineKeyboardMarkup:
+    past = int(include_past)
+    buttons = [
+        [InlineKeyboardButton(text=f"📅 {title} ({date})", callback_data=f"view_{event_id}")]
+        for event_id, title, date, _ in rows
+    ]
+    navigation = []
+    if has_prev:
+        first_id, first_ts = rows[0][0], rows[0][3]
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=f"events_prev_{past}_{first_ts}_{first_id}"))
+    if has_next:
+        last_id, last_ts = rows[-1][0], rows[-1][3]
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=f"events_next_{past}_{last_ts}_{last_id}"))
+    if navigation:
+        buttons.append(navigation)
+    buttons.append([InlineKeyboardButton(
+        text="📅 Только предстоящие" if include_past else "🕘 Показать прошедшие",
+        callback_data=f"events_first_{1 - past}"
+    )])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 async def show_events(message: Message):
-    async with aiosqlite.connect("events.db") as db:
-        cursor = await db.execute("SELECT event_id, title, date FROM events ORDER BY date")
-        events = await cursor.fetchall()
-        if not events:
-            await message.reply("📭 Нет активных событий.")
-            return
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=f"📅 {title} ({date})", callback_data=f"view_{event_id}")]
-            for event_id, title, date in events
+    rows, has_prev, has_next = await fetch_events_page("first", None, include_past=False)
+    keyboard = events_page_keyboard(rows, has_prev, has_next, include_past=False)
+    if not rows:
+        await message.reply("📭 Нет активных событий.", reply_markup=keyboard)
+        return
+    await message.reply("📋 **Выберите событие**:", reply_markup=keyboard)
+
+@router.callback_query(F.data.startswith("events_"))
+async def paginate_events(callback: CallbackQuery):
+    if not check_access(callback.from_user.id):
+        await callback.answer("🚫 Доступ запрещён.")
+        return
+    _, direction, past, *cursor = callback.data.split("_")
+    include_past = past == "1"
+    rows, has_prev, has_next = await fetch_events_page(
+        direction, tuple(int(value) for value in cursor) if cursor else None, include_past
+    )
+    if not rows and direction != "first":
+        # Соседняя страница опустела (события удалены или прошли) — начинаем сначала
+        rows, has_prev, has_next = await fetch_events_page("first", None, include_past)
+    keyboard = events_page_keyboard(rows, has_prev, has_next, include_past)
+    text = "📋 **Выберите событие**:" if rows else "📭 Нет активных событий."
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+    await callback.answer()
+
+async def fetch_roster_page(event_id: int, direction: str, cursor: Optional[int]):
+    # Keyset-пагинация по user_id внутри idx_participants_event_status
+    if direction == "prev":
+        rows = await database.fetchall(
+            "SELECT user_id, username FROM participants WHERE event_id = ? AND participation_status = 'Участвую' "
+            "AND user_id < ? ORDER BY user_id DESC LIMIT ?",
+            (event_id, cursor, ROSTER_PAGE_SIZE + 1)
+        )
+    else:
+        rows = await database.fetchall(
+            "SELECT user_id, username FROM participants WHERE event_id = ? AND participation_status = 'Участвую' "
+            "AND user_id > ? ORDER BY user_id LIMIT ?",
+            (event_id, cursor if direction == "next" else -2 ** 63, ROSTER_PAGE_SIZE + 1)
+        )
+    has_more = len(rows) > ROSTER_PAGE_SIZE
+    rows = rows[:ROSTER_PAGE_SIZE]
+    if direction == "prev":
+        rows.reverse()
+    if not rows:
+        return rows, False, False
+    if direction == "prev":
+        has_prev = has_more
+        has_next = await database.fetchone(
+            "SELECT 1 FROM participants WHERE event_id = ? AND participation_status = 'Участвую' AND user_id > ? LIMIT 1",
+            (event_id, rows[-1][0])
+        ) is not None
+    else:
+        has_next = has_more
+        has_prev = direction == "next" and await database.fetchone(
+            "SELECT 1 FROM participants WHERE event_id = ? AND participation_status = 'Участвую' AND user_id < ? LIMIT 1",
+            (event_id, rows[0][0])
+        ) is not None
+    return rows, has_prev, has_next
+
+async def render_event_view(event_id: int, direction: str, cursor: Optional[int], is_admin: bool):
+    event = await database.fetchone("SELECT title, description, date FROM events WHERE event_id = ?", (event_id,))
+    if not event:
+        return None, None
+    title, description, date = event
+    # Голоса пишутся в БД пачками; без сброса очереди на странице не будет последних отметок
+    await vote_writer.flush()
+    total = (await database.fetchone(
+        "SELECT COUNT(*) FROM participants WHERE event_id = ? AND participation_status = 'Участвую'", (event_id,)
+    ))[0]
+    rows, has_prev, has_next = await fetch_roster_page(event_id, direction, cursor)
+    if not rows and direction != "first":
+        # Страница опустела (участники передумали) — начинаем сначала
+        rows, has_prev, has_next = await fetch_roster_page(event_id, "first", None)
+    participants_text = "\n".join(
+        f"👤 @{username}".replace("_", "\\_").replace("*", "\\*").replace("`", "\\`") for _, username in rows
+    ) or "🚶‍♂️ Нет участников."
+    text = (
+        f"📅 **{title}**\n\n📝 {description}\n\n🕒 **Дата и время**: {date}\n\n"
+        f"👥 **Участники** ({total}):\n{participants_text}"
+    )
+    buttons = []
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=f"roster_{event_id}_prev_{rows[0][0]}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=f"roster_{event_id}_next_{rows[-1][0]}"))
+    if navigation:
+        buttons.append(navigation)
+    if is_admin:
+        buttons.append([
+            InlineKeyboardButton(text="📤 Экспорт CSV", callback_data=f"export_{event_id}"),
+            InlineKeyboardButton(text="🗑 Удалить событие", callback_data=f"delete_{event_id}"),
         ])
-        await message.reply("📋 **Выберите событие**:", reply_markup=keyboard)
+    return text, InlineKeyboardMarkup(inline_keyboard=buttons)
 
 @router.callback_query(F.data.startswith("view_"))
 async def view_event(callback: CallbackQuery):
     event_id = int(callback.data.replace("view_", ""))
-    async with aiosqlite.connect("events.db") as db:
-        cursor = await db.execute("SELECT title, description, date FROM events WHERE event_id = ?", (event_id,))
-        event = await cursor.fetchone()
-        if not event:
-            await callback.message.reply("❌ Событие не найдено.")
-            return
-        title, description, date = event
-        cursor = await db.execute(
-            "SELECT username, participation_status FROM participants WHERE event_id = ? AND participation_status = 'Участвую'",
-            (event_id,)
-        )
-        participants = await cursor.fetchall()
-        participants_text = "\n".join(f"👤 @{username}" for username, _ in participants) or "🚶‍♂️ Нет участников."
-        text = f"📅 **{title}**\n\n📝 {description}\n\n🕒 **Дата и время**: {date}\n\n👥 **Участники**:\n{participants_text}"
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[[
-            InlineKeyboardButton(text="🗑 Удалить событие", callback_data=f"delete_{event_id}")
-        ]] if check_access(callback.from_user.id) else [])
-        await callback.message.reply(text, reply_markup=keyboard)
-        await callback.answer()
+    text, keyboard = await render_event_view(event_id, "first", None, check_access(callback.from_user.id))
+    if text is None:
+        await callback.message.reply("❌ Событие не найдено.")
+        return
+    await callback.message.reply(text, reply_markup=keyboard)
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("roster_"))
+async def paginate_roster(callback: CallbackQuery):
+    _, event_id, direction, cursor = callback.data.split("_")
+    text, keyboard = await render_event_view(int(event_id), direction, int(cursor), check_access(callback.from_user.id))
+    if text is None:
+        await callback.answer("❌ Событие не найдено.")
+        return
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("export_"))
+async def export_roster(callback: CallbackQuery):
+    if not check_access(callback.from_user.id):
+        await callback.answer("🚫 Доступ запрещён.")
+        return
+    event_id = int(callback.data.replace("export_", ""))
+    if await database.fetchone("SELECT 1 FROM events WHERE event_id = ?", (event_id,)) is None:
+        await callback.answer("❌ Событие не найдено.")
+        return
+    await callback.answer("📤 Готовлю файл…")
+    await vote_writer.flush()
+    # Файл собирается порциями из БД прямо во время отправки
+    await bot.send_document(
+        chat_id=callback.message.chat.id, document=RosterCSVFile(database, event_id),
+        caption=f"👥 Участники события #{event_id}"
+    )
 
 @router.callback_query(F.data.startswith("delete_"))
 async def delete_event(callback: CallbackQuery):
@@ -486,16 +993,11 @@ async def delete_event(callback: CallbackQuery):
         await callback.message.reply("🚫 Доступ запрещён.")
         return
     event_id = int(callback.data.replace("delete_", ""))
-    async with aiosqlite.connect("events.db") as db:
-        cursor = await db.execute("SELECT message_id FROM events WHERE event_id = ?", (event_id,))
-        event = await cursor.fetchone()
-        if event and event[0]:
-            try:
-                await bot.delete_message(CHANNEL_ID, event[0])
-            except Exception as e:
-                logger.error(f"Ошибка при удалении сообщения: {e}")
-        await db.execute("DELETE FROM events WHERE event_id = ?", (event_id,))
-        await db.commit()
+    await publisher.delete(event_id)
+    vote_writer.discard_event(event_id)
+    roster_cache.invalidate(event_id)
+    reminder_scheduler.cancel_event(event_id)
+    await database.execute("DELETE FROM events WHERE event_id = ?", (event_id,))
     await callback.message.reply("🗑 Событие удалено.")
     await callback.answer()
 
@@ -507,39 +1009,35 @@ async def handle_participation(callback: CallbackQuery):
     username = callback.from_user.username or callback.from_user.first_name
     new_status = "Участвую" if action == "join" else "Не участвую"
 
-    async with aiosqlite.connect("events.db") as db:
-        cursor = await db.execute("SELECT event_id FROM events WHERE event_id = ?", (event_id,))
-        if not await cursor.fetchone():
-            await callback.message.reply("❌ Событие не найдено.")
-            return
+    exists, current_status = await roster_cache.status(event_id, user_id)
+    if not exists:
+        await callback.message.reply("❌ Событие не найдено.")
+        return
 
-        cursor = await db.execute(
-            "SELECT participation_status FROM participants WHERE event_id = ? AND user_id = ?",
-            (event_id, user_id)
-        )
-        current_status = await cursor.fetchone()
+    if current_status and current_status[0] == new_status:
+        await callback.answer()
+        return
 
-        if current_status and current_status[0] == new_status:
-            await callback.answer()
-            return
+    should_notify = (
+        (current_status is None and action == "join") or
+        (current_status and current_status[0] == "Участвую" and action == "decline") or
+        (current_status and current_status[0] == "Не участвую" and action == "join")
+    )
 
-        should_notify = (
-            (current_status is None and action == "join") or
-            (current_status and current_status[0] == "Участвую" and action == "decline") or
-            (current_status and current_status[0] == "Не участвую" and action == "join")
-        )
+    roster_cache.set_status(event_id, user_id, username, new_status)
+    vote_writer.submit(event_id, user_id, username, new_status)
 
-        await db.execute(
-            """
-            INSERT OR REPLACE INTO participants (event_id, user_id, username, participation_status)
-            VALUES (?, ?, ?, ?)
-            """,
-            (event_id, user_id, username, new_status)
-        )
-        await db.commit()
+    if LIVE_COUNTERS:
+        posts = set(await publisher.posts(event_id))
+        if callback.message:
+            posts.add((callback.message.chat.id, callback.message.message_id))
+        for chat_id, message_id in posts:
+            post_counters.schedule(chat_id, message_id, event_id)
+        await callback.answer(f"Вы отметили: {new_status}")
+        return
 
-        if should_notify:
-            await callback.message.reply(f"👤 @{username} отметил: {new_status}")
+    if should_notify:
+        await callback.message.reply(f"👤 @{username} отметил: {new_status}")
 
     await callback.answer()
 
@@ -553,16 +1051,127 @@ async def errors_handler(update, exception):
         await update.message.reply(f"❌ Ошибка: {error_msg}. Попробуйте снова.")
     return True
 
-async def main():
+async def on_startup():
+    await database.open()
     await init_db()
-    dp = Dispatcher()
+    vote_writer.start()
+
+async def start_background_jobs():
+    await archiver.enable_incremental_vacuum()
+    fsm_storage.start()
+    reminder_scheduler.start()
+    archiver.start()
+
+async def stop_background_jobs():
+    await archiver.close()
+    await reminder_scheduler.close()
+
+async def on_shutdown():
+    # Импорт может публиковать ещё минуты; отменяем его, а уже отправленные посты он запишет в базу сам
+    for task in import_tasks:
+        task.cancel()
+    await asyncio.gather(*import_tasks, return_exceptions=True)
+    await post_counters.close()
+    await vote_writer.close()
+    await database.close()
+    logger.info(f"Outbound queue stats: {outbound.stats()}")
+    await outbound.close()
+
+def create_dispatcher(background_jobs: bool = True) -> Dispatcher:
+    dp = Dispatcher(storage=fsm_storage)
+    dp.update.outer_middleware(metrics_middleware)
     dp.include_router(router)
+    dp.startup.register(on_startup)
+    if background_jobs:
+        dp.startup.register(start_background_jobs)
+        dp.shutdown.register(stop_background_jobs)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+def dump_metrics(dp: Dispatcher, path: str):
+    metrics_dumper = MetricsDumper(metrics, path, interval=METRICS_DUMP_INTERVAL)
+
+    async def start_metrics_dump():
+        metrics_dumper.start()
+
+    dp.startup.register(start_metrics_dump)
+    dp.shutdown.register(metrics_dumper.close)
+
+def create_webhook_app(worker_index: int = 0, workers: int = 1, webhook_url: Optional[str] = None,
+                       path: str = WEBHOOK_PATH, secret: Optional[str] = WEBHOOK_SECRET) -> web.Application:
+    # Напоминания и очистка сессий работают только в одном воркере
+    dp = create_dispatcher(background_jobs=worker_index == 0)
+    if workers > 1:
+        # Каждый воркер видит только свои записи, поэтому составы и состояние мастера читаются из БД, а не из кэша
+        roster_cache.max_events = 0
+        fsm_storage.cache_ttl = 0
+        # Лимиты Telegram общие на токен, а планировщик и счётчики постов у каждого воркера свои
+        outbound.share_limits(workers)
+        post_counters.interval *= workers
+    if webhook_url and worker_index == 0:
+        async def set_webhook():
+            await bot.set_webhook(webhook_url, secret_token=secret, allowed_updates=dp.resolve_used_update_types())
+            logger.info(f"Webhook set to {webhook_url}")
+        dp.startup.register(set_webhook)
+
+    def health() -> dict:
+        return {
+            "status": "ok" if database.is_open else "starting",
+            "worker": worker_index,
+            "outbound_depth": outbound.depth,
+        }
+
+    if workers <= 1:
+        return create_app(dp, bot, path=path, secret_token=secret, health=health, metrics=metrics.render)
+    # Запрос к общему порту попадает в случайный воркер, так что /metrics показывал бы несвязанные ряды
+    metrics.const_labels["worker"] = worker_index
+    if METRICS_FILE:
+        stem, extension = os.path.splitext(METRICS_FILE)
+        dump_metrics(dp, f"{stem}.worker{worker_index}{extension}")
+    elif worker_index == 0:
+        logger.warning("С несколькими воркерами /metrics отключён; задайте METRICS_FILE, чтобы собирать метрики")
+    return create_app(dp, bot, path=path, secret_token=secret, health=health)
+
+async def import_file(path: str):
+    await on_startup()
     try:
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            report = await importer.insert(read_rows(stream, import_format(path)))
+        await importer.publish(report)
+        print(report.summary())
+    finally:
+        await on_shutdown()
+        await bot.session.close()
+
+async def main():
+    dp = create_dispatcher()
+    if METRICS_FILE:
+        # В режиме polling нет HTTP-сервера для /metrics
+        dump_metrics(dp, METRICS_FILE)
+    try:
+        await bot.delete_webhook()
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}", exc_info=True)
         raise
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="Бот для управления событиями")
+    arg_parser.add_argument("--mode", choices=["polling", "webhook"], default=RUN_MODE)
+    arg_parser.add_argument("--host", default=WEBHOOK_HOST)
+    arg_parser.add_argument("--port", type=int, default=WEBHOOK_PORT)
+    arg_parser.add_argument("--workers", type=int, default=WEBHOOK_WORKERS, help="процессов на одном порту (webhook)")
+    arg_parser.add_argument("--webhook-url", default=WEBHOOK_URL, help="если задан, регистрируется через setWebhook")
+    arg_parser.add_argument("--webhook-path", default=WEBHOOK_PATH)
+    arg_parser.add_argument("--import", dest="import_file", metavar="FILE",
+                            help="добавить и опубликовать события из .csv/.jsonl и выйти")
+    args = arg_parser.parse_args()
+    if args.import_file:
+        asyncio.run(import_file(args.import_file))
+    elif args.mode == "webhook":
+        run_webhook(
+            functools.partial(create_webhook_app, workers=args.workers, webhook_url=args.webhook_url, path=args.webhook_path),
+            host=args.host, port=args.port, workers=args.workers
+        )
+    else:
+        asyncio.run(main())
@@ -0,0 +1,253 @@
+import asyncio
+import bisect
+import logging
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramAPIError
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+# Seconds; tuned for handlers and queries that should finish in milliseconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = tuple[tuple[str, str], ...]
+# A collector returns (name, type, help, labels, value) samples read from other components at render time
+Sample = tuple[str, str, str, Dict[str, Any], float]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[tuple[str, Any]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+@lru_cache(maxsize=1024)
+def statement_label(sql: str) -> str:
+    """Short, stable label for an SQL statement: whitespace collapsed, IN-lists folded, truncated."""
+    text = " ".join(sql.split())
+    text = re.sub(r"\?(?:, \?)+", "?, ...", text)
+    return text if len(text) <= 100 else text[:97] + "..."
+
+
+class Metrics:
+    """In-process counters and latency histograms rendered in the Prometheus text format.
+
+    ``const_labels`` are added to every rendered series, e.g. ``worker`` to tell apart
+    processes that each keep their own registry.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS, const_labels: Optional[Dict[str, Any]] = None):
+        self.buckets = buckets
+        self.const_labels = dict(const_labels or {})
+        self._meta: dict[str, tuple[str, str]] = {}
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, Histogram]] = {}
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._meta[name] = (kind, help_text)
+        if kind == "counter":
+            self._counters.setdefault(name, {})
+        elif kind == "histogram":
+            self._histograms.setdefault(name, {})
+
+    @staticmethod
+    def _key(labels: Dict[str, Any]) -> Labels:
+        return tuple(sorted((label, str(label_value)) for label, label_value in labels.items()))
+
+    def inc(self, name: str, amount: float = 1, **labels: Any):
+        series = self._counters[name]
+        key = self._key(labels)
+        series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: Any):
+        series = self._histograms[name]
+        key = self._key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def collector(self, collect: Callable[[], Iterable[Sample]]):
+        self._collectors.append(collect)
+
+    def observe_query(self, sql: str, seconds: float):
+        """``Database.on_query`` hook."""
+        self.observe("bot_db_query_seconds", seconds, statement=statement_label(sql))
+
+    def render(self) -> str:
+        lines = []
+        const = self._key(self.const_labels)
+        for name, series in self._counters.items():
+            kind, help_text = self._meta[name]
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{_format_labels((*const, *labels))} {value:g}" for labels, value in series.items()]
+        for name, series in self._histograms.items():
+            kind, help_text = self._meta[name]
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, histogram in series.items():
+                labels = (*const, *labels)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels((*labels, ('le', f'{bound:g}')))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels((*labels, ('le', '+Inf')))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        described = set()
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                logger.error(f"Ошибка при сборе метрик: {e}")
+                continue
+            for name, kind, help_text, labels, value in samples:
+                if name not in described:
+                    described.add(name)
+                    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                lines.append(f"{name}{_format_labels((*const, *sorted(labels.items())))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def bot_metrics() -> Metrics:
+    """Registry with the series recorded by the middlewares below and by ``Database.on_query``."""
+    metrics = Metrics()
+    metrics.describe("bot_update_seconds", "histogram", "Time to process an update, by update type")
+    metrics.describe("bot_handler_seconds", "histogram", "Time spent in a handler, by handler")
+    metrics.describe("bot_handler_errors_total", "counter", "Handlers that raised, by handler and exception")
+    metrics.describe("bot_db_query_seconds", "histogram", "SQL statement time, by statement")
+    metrics.describe("bot_api_request_seconds", "histogram", "Bot API request time, by method")
+    metrics.describe("bot_api_errors_total", "counter", "Failed Bot API requests, by method and error")
+    return metrics
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Times updates and handlers.
+
+    Register as an outer middleware on ``dp.update`` for per-update-type latency and as
+    an inner middleware on the router's observers for per-handler latency and errors.
+    """
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        start = time.perf_counter()
+        if isinstance(event, Update):
+            try:
+                return await handler(event, data)
+            finally:
+                self.metrics.observe("bot_update_seconds", time.perf_counter() - start, type=event.event_type)
+
+        handler_object = data.get("handler")
+        name = getattr(handler_object.callback, "__name__", "unknown") if handler_object is not None else "unknown"
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            self.metrics.inc("bot_handler_errors_total", handler=name, error=type(e).__name__)
+            raise
+        finally:
+            self.metrics.observe("bot_handler_seconds", time.perf_counter() - start, handler=name)
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    """Bot session middleware that times Bot API requests and counts failures per method.
+
+    Register it after ``OutboundScheduler`` so it times the HTTP request itself, not the queue.
+    """
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except (TelegramAPIError, asyncio.TimeoutError, OSError) as e:
+            self.metrics.inc("bot_api_errors_total", method=name, error=type(e).__name__)
+            raise
+        finally:
+            self.metrics.observe("bot_api_request_seconds", time.perf_counter() - start, method=name)
+
+
+class MetricsDumper:
+    """Periodically writes the rendered metrics to ``path``, for setups without an HTTP server.
+
+    The file is replaced atomically, so node_exporter's textfile collector can pick it up.
+    """
+
+    def __init__(self, metrics: Metrics, path: str, interval: float = 60):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self.dump()
+
+    def dump(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.metrics.render())
+        os.replace(tmp_path, self.path)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.dump()
+            except Exception as e:
+                logger.error(f"Не удалось записать метрики в {self.path}: {e}")
@@ -0,0 +1,67 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Sequence
+
+import aiosqlite
+
+from db import Database
+
+logger = logging.getLogger(__name__)
+
+# (version, description, step); a step gets the writer connection inside the migration's transaction
+Migration = tuple[int, str, Callable[[Any], Awaitable[None]]]
+
+
+async def schema_version(database: Database) -> int:
+    try:
+        row = await database.fetchone("SELECT max(version) FROM schema_version")
+    except aiosqlite.OperationalError:
+        # No such table: a new database, or one created before migrations
+        return 0
+    return row[0] or 0
+
+
+async def migrate(database: Database, migrations: Sequence[Migration]) -> int:
+    """Applies the migrations newer than the database's schema version, in order; returns how many ran.
+
+    When the schema is current this is a single read. Every migration runs in its own
+    ``BEGIN IMMEDIATE`` transaction together with its ``schema_version`` row, so a failed
+    step leaves the database at the previous version, and processes starting at the same
+    time (webhook workers) apply each step once. Steps must not call ``executescript``
+    or ``commit``: either would end the transaction early.
+    """
+    versions = [version for version, _, _ in migrations]
+    if versions != sorted(set(versions)):
+        raise ValueError("Migration versions must be unique and in ascending order")
+    latest = versions[-1] if versions else 0
+    current = await schema_version(database)
+    if current >= latest:
+        if current > latest:
+            logger.warning(f"Database schema version {current} is newer than the code's {latest}")
+        return 0
+
+    async with database.write() as db:
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at INTEGER NOT NULL
+            )
+        ''')
+    applied = 0
+    for version, description, step in migrations:
+        if version <= current:
+            continue
+        async with database.write() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            cursor = await db.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+            if await cursor.fetchone() is None:
+                logger.info(f"Applying migration {version}: {description}")
+                await step(db)
+                await db.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, int(time.time()))
+                )
+                applied += 1
+    logger.info(f"Database schema is at version {latest}, {applied} migrations applied")
+    return applied
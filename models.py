@@ -0,0 +1,83 @@
+from datetime import datetime
+from typing import Callable, Optional
+
+from dateutil import parser
+from pydantic import BaseModel, field_validator
+
+DATE_FORMAT = "%d.%m.%Y %H:%M"
+
+
+def parse_event_date(value: str) -> datetime:
+    # Быстрый путь для ДД.ММ.ГГГГ ЧЧ:ММ без strptime; всё остальное разбирает dateutil
+    if len(value) == 16 and value[2] == "." and value[5] == "." and value[10] == " " and value[13] == ":":
+        digits = value[0:2] + value[3:5] + value[6:10] + value[11:13] + value[14:16]
+        if digits.isascii() and digits.isdigit():
+            try:
+                return datetime(int(value[6:10]), int(value[3:5]), int(value[0:2]), int(value[11:13]), int(value[14:16]))
+            except ValueError:
+                pass
+    # ISO-даты (ГГГГ-ММ-ДД) с dayfirst разбираются как ГГГГ-ДД-ММ
+    return parser.parse(value, dayfirst=not value.lstrip()[:4].isdigit())
+
+
+def date_to_timestamp(value: str) -> int:
+    return int(parse_event_date(value).timestamp())
+
+
+def check_title(value: str) -> str:
+    if len(value) > 100:
+        raise ValueError("Название события не должно превышать 100 символов")
+    if len(value.strip()) == 0:
+        raise ValueError("Название события не может быть пустым")
+    return value
+
+
+def check_description(value: str) -> str:
+    if len(value) > 1000:
+        raise ValueError("Описание события не должно превышать 1000 символов")
+    if len(value.strip()) == 0:
+        raise ValueError("Описание события не может быть пустым")
+    return value
+
+
+def check_date(value: str) -> str:
+    try:
+        parsed_date = parse_event_date(value)
+    except (ValueError, OverflowError):
+        raise ValueError("Неверный формат даты. Используйте ДД.ММ.ГГГГ ЧЧ:ММ")
+    if parsed_date < datetime.now():
+        raise ValueError("Дата события должна быть в будущем")
+    return value
+
+
+FIELD_CHECKS: dict[str, Callable[[str], str]] = {
+    "title": check_title,
+    "description": check_description,
+    "date": check_date,
+}
+
+
+class Event(BaseModel):
+    title: str
+    description: str
+    date: str
+    image_id: Optional[str] = None
+
+    @field_validator("title")
+    def validate_title(cls, value):
+        return check_title(value)
+
+    @field_validator("description")
+    def validate_description(cls, value):
+        return check_description(value)
+
+    @field_validator("date")
+    def validate_date(cls, value):
+        return check_date(value)
+
+    @classmethod
+    def validate_field(cls, name: str, value: str) -> str:
+        """Check a single field with the model's rules, without building the whole model."""
+        if not isinstance(value, str):
+            raise ValueError(f"Поле {name} должно быть строкой")
+        return FIELD_CHECKS[name](value)
@@ -0,0 +1,300 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from collections import deque
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Optional, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    AnswerCallbackQuery,
+    AnswerInlineQuery,
+    CopyMessage,
+    DeleteMessage,
+    DeleteMessages,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    ForwardMessage,
+    Response,
+    SendDocument,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    CALLBACK = 0  # answerCallbackQuery — пользователь ждёт «часики» на кнопке; своя квота, не из бюджета сообщений
+    INTERACTIVE = 1  # ответы и правки в диалоге с пользователем
+    NOTIFICATION = 2  # посты и правки в канале, напоминания
+    BULK = 3  # массовые рассылки и импорт
+
+
+# Only these methods are queued; getUpdates, getMe, webhook calls etc. pass straight through
+METHOD_PRIORITIES: dict[type, Priority] = {
+    AnswerCallbackQuery: Priority.CALLBACK,
+    AnswerInlineQuery: Priority.CALLBACK,
+    SendMessage: Priority.INTERACTIVE,
+    SendPhoto: Priority.INTERACTIVE,
+    SendDocument: Priority.INTERACTIVE,
+    SendMediaGroup: Priority.INTERACTIVE,
+    CopyMessage: Priority.INTERACTIVE,
+    ForwardMessage: Priority.INTERACTIVE,
+    EditMessageText: Priority.INTERACTIVE,
+    EditMessageCaption: Priority.INTERACTIVE,
+    EditMessageMedia: Priority.INTERACTIVE,
+    EditMessageReplyMarkup: Priority.INTERACTIVE,
+    DeleteMessage: Priority.INTERACTIVE,
+    DeleteMessages: Priority.INTERACTIVE,
+}
+
+_priority_override: ContextVar[Optional[Priority]] = ContextVar("outbound_priority", default=None)
+
+
+@contextmanager
+def outbound_priority(priority: Priority):
+    """Send every request made inside the block (in this task) with the given priority."""
+    token = _priority_override.set(priority)
+    try:
+        yield
+    finally:
+        _priority_override.reset(token)
+
+
+class TokenBucket:
+    """Reservation-based token bucket: callers reserve a token and sleep for the returned delay."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        delay = self.delay()
+        self.tokens -= 1
+        return delay
+
+    def pause(self, seconds: float):
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    @property
+    def idle(self) -> bool:
+        return self.delay() == 0.0 and self.tokens >= self.capacity
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """Bot session middleware that paces every outgoing send, edit and delete.
+
+    Requests first wait for their chat's token bucket (FIFO per chat), then for the
+    global bucket. The global bucket is granted by ``Priority`` with aging: a request's
+    priority improves by one level for every ``aging`` seconds it has waited, so a steady
+    stream of interactive replies cannot starve notifications and bulk sends. Callback and
+    inline answers are not messages and do not spend the global budget; they only wait
+    for their own ``answer_rate`` bucket. ``TelegramRetryAfter`` pauses the affected
+    bucket for ``retry_after`` seconds and the request is retried.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        private_chat_rate: float = 1.0,
+        group_chat_rate: float = 20 / 60,
+        chat_burst: float = 3.0,
+        answer_rate: float = 100.0,
+        aging: float = 2.0,
+        max_retries: int = 3,
+        max_chat_buckets: int = 10_000,
+    ):
+        self.private_chat_rate = private_chat_rate
+        self.group_chat_rate = group_chat_rate
+        self.chat_burst = chat_burst
+        self.aging = aging
+        self.max_retries = max_retries
+        self.max_chat_buckets = max_chat_buckets
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self.max_depth = 0
+        self._global = TokenBucket(global_rate, global_rate)
+        self._answers = TokenBucket(answer_rate, answer_rate)
+        self._chats: dict[Union[int, str], TokenBucket] = {}
+        self._chat_waiting = 0
+        self._answer_waiting = 0
+        # One FIFO per priority: (enqueued_at, seq, future)
+        self._waiters: dict[Priority, deque[tuple[float, int, asyncio.Future]]] = {
+            priority: deque() for priority in Priority
+        }
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def share_limits(self, workers: int):
+        """Scale every limit down to 1/``workers`` for processes sending through one bot token."""
+        global_rate = self._global.rate / workers
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self.private_chat_rate /= workers
+        self.group_chat_rate /= workers
+        self.chat_burst = max(1.0, self.chat_burst / workers)
+        answer_rate = self._answers.rate / workers
+        self._answers = TokenBucket(answer_rate, max(1.0, answer_rate))
+        self._chats.clear()
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        priority = _priority_override.get()
+        if priority is None:
+            priority = METHOD_PRIORITIES.get(type(method))
+        if priority is None:
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority, chat_id)
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    self.failed += 1
+                    raise
+                self.retries += 1
+                logger.warning(f"{type(method).__name__} в чат {chat_id}: флуд-контроль, повтор через {e.retry_after} с")
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).pause(e.retry_after)
+                else:
+                    (self._answers if priority == Priority.CALLBACK else self._global).pause(e.retry_after)
+                continue
+            self.sent += 1
+            return response
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        # CHANNEL_ID comes from the environment as "-100…" while callbacks carry the int id
+        if isinstance(chat_id, str) and chat_id.lstrip("-").isdigit():
+            chat_id = int(chat_id)
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chat_buckets:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle}
+            # Groups and channels have negative ids or @usernames and a much lower limit
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            bucket = TokenBucket(self.group_chat_rate if is_group else self.private_chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _acquire(self, priority: Priority, chat_id: Optional[Union[int, str]]):
+        if chat_id is not None:
+            delay = self._chat_bucket(chat_id).reserve()
+            if delay > 0:
+                self._chat_waiting += 1
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self._chat_waiting -= 1
+
+        if priority == Priority.CALLBACK:
+            delay = self._answers.reserve()
+            if delay > 0:
+                self._answer_waiting += 1
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    self._answer_waiting -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append((time.monotonic(), next(self._seq), future))
+        self.max_depth = max(self.max_depth, self.depth)
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        self._wakeup.set()
+        await future
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Pops the queue head with the best aged priority; FIFO within a priority."""
+        now = time.monotonic()
+        best = None
+        for priority, queue in self._waiters.items():
+            while queue and queue[0][2].done():
+                queue.popleft()
+            if queue:
+                enqueued_at, seq, _ = queue[0]
+                key = (priority - (now - enqueued_at) / self.aging, seq)
+                if best is None or key < best[0]:
+                    best = (key, queue)
+        return best[1].popleft()[2] if best is not None else None
+
+    async def _pump(self):
+        while True:
+            if not any(self._waiters.values()):
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._global.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            future = self._next_waiter()
+            if future is None:
+                continue
+            self._global.reserve()
+            future.set_result(None)
+
+    @property
+    def depth(self) -> int:
+        return sum(map(len, self._waiters.values())) + self._chat_waiting + self._answer_waiting
+
+    def stats(self) -> dict[str, int]:
+        by_priority = {
+            priority.name.lower(): sum(1 for _, _, future in queue if not future.done())
+            for priority, queue in self._waiters.items()
+        }
+        by_priority["callback"] += self._answer_waiting
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "waiting_for_chat": self._chat_waiting,
+            **{f"waiting_{name}": count for name, count in by_priority.items()},
+            "sent": self.sent,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
+
+    async def close(self):
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+            self._pump_task = None
+        for queue in self._waiters.values():
+            for _, _, future in queue:
+                if not future.done():
+                    future.cancel()
+            queue.clear()
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup
+
+from outbound import Priority, outbound_priority
+
+logger = logging.getLogger(__name__)
+
+
+class PostCounterUpdater:
+    """Debounced edits of a post's inline keyboard.
+
+    However many votes arrive, each (chat_id, message_id) is edited at most once per
+    ``interval`` seconds; the keyboard is rendered at edit time, so the last edit in
+    a burst always shows the latest counts.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        render: Callable[[int], Awaitable[Optional[InlineKeyboardMarkup]]],
+        interval: float = 3.0,
+    ):
+        self.bot = bot
+        self.render = render
+        self.interval = interval
+        self.edits = 0
+        self._last_edit: dict[tuple[int, int], float] = {}
+        self._scheduled: dict[tuple[int, int], asyncio.Task] = {}
+
+    def schedule(self, chat_id: int, message_id: int, event_id: int):
+        key = (chat_id, message_id)
+        if key in self._scheduled:
+            return
+        delay = max(0.0, self._last_edit.get(key, 0.0) + self.interval - time.monotonic())
+        self._scheduled[key] = asyncio.create_task(self._edit_later(key, event_id, delay))
+
+    async def _edit_later(self, key: tuple[int, int], event_id: int, delay: float):
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            # Votes arriving from here on need another edit after this one
+            self._scheduled.pop(key, None)
+        self._last_edit[key] = time.monotonic()
+        markup = await self.render(event_id)
+        if markup is None:
+            return
+        chat_id, message_id = key
+        try:
+            with outbound_priority(Priority.NOTIFICATION):
+                await self.bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=markup)
+            self.edits += 1
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.error(f"Ошибка при обновлении счётчика поста {key}: {e}")
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении счётчика поста {key}: {e}")
+        self._prune()
+
+    def _prune(self):
+        # Forget posts that have been quiet for a while so the map doesn't grow forever
+        expired = time.monotonic() - self.interval
+        for key in [key for key, at in self._last_edit.items() if at < expired and key not in self._scheduled]:
+            del self._last_edit[key]
+
+    async def close(self):
+        tasks = list(self._scheduled.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._scheduled.clear()
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+
+from db import Database
+from outbound import Priority, outbound_priority
+
+logger = logging.getLogger(__name__)
+
+ChatId = Union[int, str]
+Post = tuple[ChatId, int]
+
+
+class PublishResult:
+    __slots__ = ("posted", "failed")
+
+    def __init__(self):
+        # (chat_id, message_id) of every post that went out
+        self.posted: list[Post] = []
+        # (chat_id, error) for every chat that did not get the post
+        self.failed: list[tuple[ChatId, str]] = []
+
+
+class Publisher:
+    """Fans event posts out to several chats and keeps track of them in ``publications``.
+
+    Sends and deletes run concurrently, at most ``concurrency`` at a time; the outbound
+    queue still paces each chat. A chat that fails does not undo the posts that went out
+    elsewhere. Recently used events' posts are cached for the live counters.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        database: Database,
+        chat_ids: Iterable[ChatId],
+        concurrency: int = 5,
+        max_cached: int = 1024,
+    ):
+        self.bot = bot
+        self.database = database
+        self.chat_ids = list(chat_ids)
+        self.concurrency = concurrency
+        self.max_cached = max_cached
+        self._posts: OrderedDict[int, list[Post]] = OrderedDict()
+
+    async def _fan_out(self, items: list, call: Callable[..., Awaitable]) -> list:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(item):
+            async with semaphore:
+                return await call(item)
+
+        return await asyncio.gather(*(bounded(item) for item in items), return_exceptions=True)
+
+    async def publish(
+        self, event_id: int, send: Callable[[ChatId], Awaitable[Message]], record: bool = True
+    ) -> PublishResult:
+        """Calls ``send(chat_id)`` for every chat; with ``record`` the posts are stored right away."""
+        result = PublishResult()
+        for chat_id, outcome in zip(self.chat_ids, await self._fan_out(self.chat_ids, send)):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Не удалось опубликовать событие {event_id} в чат {chat_id}: {outcome}")
+                result.failed.append((chat_id, str(outcome)))
+            else:
+                result.posted.append((outcome.chat.id, outcome.message_id))
+        if record and result.posted:
+            await self.record([(event_id, chat_id, message_id) for chat_id, message_id in result.posted])
+        return result
+
+    async def record(self, rows: list[tuple[int, ChatId, int]]):
+        """Stores (event_id, chat_id, message_id) rows in one transaction."""
+        async with self.database.write() as db:
+            await db.executemany(
+                "INSERT OR REPLACE INTO publications (event_id, chat_id, message_id) VALUES (?, ?, ?)", rows
+            )
+        for event_id in {event_id for event_id, _, _ in rows}:
+            self._posts.pop(event_id, None)
+
+    async def posts(self, event_id: int) -> list[Post]:
+        posts = self._posts.get(event_id)
+        if posts is not None:
+            self._posts.move_to_end(event_id)
+            return posts
+        rows = await self.database.fetchall(
+            "SELECT chat_id, message_id FROM publications WHERE event_id = ?", (event_id,)
+        )
+        posts = [(chat_id, message_id) for chat_id, message_id in rows]
+        self._posts[event_id] = posts
+        while len(self._posts) > self.max_cached:
+            self._posts.popitem(last=False)
+        return posts
+
+    def forget(self, event_id: int):
+        self._posts.pop(event_id, None)
+
+    async def delete(self, event_id: int, priority: Priority = Priority.NOTIFICATION) -> int:
+        """Deletes the event's post from every chat at once; returns how many were deleted.
+
+        The ``publications`` rows go away with the event (ON DELETE CASCADE).
+        """
+        posts = await self.posts(event_id)
+        self.forget(event_id)
+
+        async def delete_post(post: Post):
+            chat_id, message_id = post
+            with outbound_priority(priority):
+                await self.bot.delete_message(chat_id, message_id)
+
+        deleted = 0
+        for (chat_id, message_id), outcome in zip(posts, await self._fan_out(posts, delete_post)):
+            if isinstance(outcome, TelegramBadRequest) and "message to delete not found" in str(outcome):
+                continue
+            if isinstance(outcome, BaseException):
+                logger.error(f"Ошибка при удалении сообщения {message_id} в чате {chat_id}: {outcome}")
+            else:
+                deleted += 1
+        return deleted
@@ -0,0 +1,178 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Iterable, Optional
+
+from aiogram import Bot
+
+from db import Database
+from outbound import Priority, outbound_priority
+from votes import VoteWriter
+
+logger = logging.getLogger(__name__)
+
+
+def format_offset(seconds: int) -> str:
+    if seconds % 86400 == 0:
+        return f"{seconds // 86400} дн."
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600} ч"
+    return f"{seconds // 60} мин"
+
+
+class ReminderScheduler:
+    """Sends reminders to participants with status "Участвую" ``offsets`` seconds before an event.
+
+    Due times live in a heap filled from an indexed range query on ``events.date_ts``
+    covering the next ``horizon`` seconds, refreshed every ``refresh_interval`` and
+    updated incrementally by ``schedule_event``/``cancel_event``. Every recipient is
+    recorded in ``reminders_sent`` before the message goes out, so a restart never
+    sends the same reminder twice.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        database: Database,
+        offsets: Iterable[int] = (24 * 3600, 3600),
+        vote_writer: Optional[VoteWriter] = None,
+        horizon: float = 3600,
+        refresh_interval: float = 600,
+        grace: float = 15 * 60,
+        concurrency: int = 10,
+        batch_size: int = 100,
+    ):
+        self.bot = bot
+        self.database = database
+        self.offsets = sorted(set(offsets), reverse=True)
+        self.vote_writer = vote_writer
+        self.horizon = horizon
+        self.refresh_interval = refresh_interval
+        self.grace = grace
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.sent = 0
+        self.failed = 0
+        self._heap: list[tuple[int, int, int]] = []
+        # event_id -> date_ts of scheduled events; heap entries that no longer match are stale
+        self._events: dict[int, int] = {}
+        self._loaded_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule_event(self, event_id: int, date_ts: int):
+        if date_ts > self._loaded_until:
+            return  # the next refresh picks it up
+        self._push(event_id, date_ts, time.time())
+        self._wakeup.set()
+
+    def cancel_event(self, event_id: int):
+        self._events.pop(event_id, None)
+
+    def _push(self, event_id: int, date_ts: int, now: float):
+        if self._events.get(event_id) == date_ts:
+            return
+        self._events[event_id] = date_ts
+        for offset in self.offsets:
+            due = date_ts - offset
+            if due >= now - self.grace and date_ts > now:
+                heapq.heappush(self._heap, (due, event_id, offset))
+
+    async def _refresh(self):
+        now = time.time()
+        until = now + max(self.offsets) + self.horizon
+        rows = await self.database.fetchall(
+            "SELECT event_id, date_ts FROM events WHERE date_ts > ? AND date_ts <= ? ORDER BY date_ts",
+            (int(now), int(until))
+        )
+        upcoming = {event_id for event_id, _ in rows}
+        self._events = {event_id: date_ts for event_id, date_ts in self._events.items() if event_id in upcoming}
+        for event_id, date_ts in rows:
+            self._push(event_id, date_ts, now)
+        self._loaded_until = until
+
+    async def _run(self):
+        next_refresh = 0.0
+        while True:
+            try:
+                now = time.time()
+                if now >= next_refresh:
+                    await self._refresh()
+                    next_refresh = now + self.refresh_interval
+                while self._heap and self._heap[0][0] <= now:
+                    due, event_id, offset = heapq.heappop(self._heap)
+                    if event_id not in self._events or self._events[event_id] - offset != due:
+                        continue
+                    await self._send(event_id, offset)
+                timeout = next_refresh - time.time()
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - time.time())
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в планировщике напоминаний: {e}", exc_info=True)
+                await asyncio.sleep(5)
+
+    async def _send(self, event_id: int, offset: int):
+        event = await self.database.fetchone("SELECT title, date FROM events WHERE event_id = ?", (event_id,))
+        if event is None:
+            return
+        title, date = event
+        text = f"⏰ Напоминание: **{title}** через {format_offset(offset)}\n\n🕒 **Дата и время**: {date}"
+        if self.vote_writer is not None:
+            await self.vote_writer.flush()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send_one(user_id: int):
+            async with semaphore:
+                try:
+                    with outbound_priority(Priority.NOTIFICATION):
+                        await self.bot.send_message(chat_id=user_id, text=text)
+                    self.sent += 1
+                except Exception as e:
+                    # Пользователь мог не начинать диалог с ботом или заблокировать его
+                    self.failed += 1
+                    logger.error(f"Не удалось отправить напоминание пользователю {user_id}: {e}")
+
+        while True:
+            # Recipients are claimed before sending: after a crash they are skipped, not messaged twice
+            async with self.database.write() as db:
+                cursor = await db.execute(
+                    """
+                    SELECT p.user_id FROM participants p
+                    WHERE p.event_id = ? AND p.participation_status = 'Участвую' AND NOT EXISTS (
+                        SELECT 1 FROM reminders_sent r
+                        WHERE r.event_id = p.event_id AND r.offset_seconds = ? AND r.user_id = p.user_id
+                    )
+                    LIMIT ?
+                    """,
+                    (event_id, offset, self.batch_size)
+                )
+                batch = [user_id for user_id, in await cursor.fetchall()]
+                await db.executemany(
+                    "INSERT OR IGNORE INTO reminders_sent (event_id, offset_seconds, user_id, sent_at) VALUES (?, ?, ?, ?)",
+                    [(event_id, offset, user_id, int(time.time())) for user_id in batch]
+                )
+            if not batch:
+                break
+            await asyncio.gather(*(send_one(user_id) for user_id in batch))
+        logger.info(f"Reminders for event {event_id} ({format_offset(offset)} before) sent")
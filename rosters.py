@@ -0,0 +1,202 @@
+import asyncio
+import csv
+import io
+from collections import Counter, OrderedDict
+from typing import AsyncGenerator, AsyncIterator, Optional
+
+from aiogram import Bot
+from aiogram.types import InputFile
+
+from db import Database
+from votes import VoteWriter
+
+# user_id -> (participation_status, username)
+Roster = dict[int, tuple[str, str]]
+
+
+class RosterCache:
+    """LRU cache of event existence and participant rosters.
+
+    A cached ``None`` means the event does not exist. Rosters are loaded once from
+    the database (plus votes still buffered in ``vote_writer``) and then kept current
+    by ``set_status``; cold events are evicted once ``max_events`` rosters or
+    ``max_members`` participants in total are held. ``max_events = 0`` disables caching:
+    ``status`` and ``counts`` then answer with indexed point and count queries instead
+    of reading whole rosters.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        vote_writer: Optional[VoteWriter] = None,
+        max_events: int = 256,
+        max_members: int = 200_000,
+    ):
+        self.database = database
+        self.vote_writer = vote_writer
+        self.max_events = max_events
+        self.max_members = max_members
+        self.hits = 0
+        self.misses = 0
+        self._rosters: OrderedDict[int, Optional[Roster]] = OrderedDict()
+        self._members = 0
+        self._loads: dict[int, asyncio.Future] = {}
+        # Writes that arrive while an event's roster is being read from disk
+        self._loading: dict[int, Roster] = {}
+        self._deleted_while_loading: set[int] = set()
+
+    async def get(self, event_id: int) -> Optional[Roster]:
+        if event_id in self._rosters:
+            self.hits += 1
+            self._rosters.move_to_end(event_id)
+            return self._rosters[event_id]
+        self.misses += 1
+        load = self._loads.get(event_id)
+        if load is None:
+            load = asyncio.ensure_future(self._load(event_id))
+            self._loads[event_id] = load
+            load.add_done_callback(lambda _: self._loads.pop(event_id, None))
+        return await asyncio.shield(load)
+
+    async def status(self, event_id: int, user_id: int) -> tuple[bool, Optional[tuple[str, str]]]:
+        """(event exists, the user's (status, username) or None)."""
+        if self.max_events > 0:
+            roster = await self.get(event_id)
+            return roster is not None, roster.get(user_id) if roster is not None else None
+        row = await self.database.fetchone(
+            "SELECT p.participation_status, p.username FROM events AS e "
+            "LEFT JOIN participants AS p ON p.event_id = e.event_id AND p.user_id = ? WHERE e.event_id = ?",
+            (user_id, event_id)
+        )
+        if row is None:
+            return False, None
+        entry = (row[0], row[1]) if row[0] is not None else None
+        if self.vote_writer is not None:
+            entry = self.vote_writer.pending_for_event(event_id).get(user_id, entry)
+        return True, entry
+
+    async def counts(self, event_id: int) -> Optional[dict[str, int]]:
+        """Participants per status, or None if the event does not exist.
+
+        Uncached counts come from the database and lag votes still buffered in
+        ``vote_writer`` by up to one flush interval.
+        """
+        if self.max_events > 0:
+            roster = await self.get(event_id)
+            return Counter(status for status, _ in roster.values()) if roster is not None else None
+        async with self.database.read() as db:
+            cursor = await db.execute("SELECT 1 FROM events WHERE event_id = ?", (event_id,))
+            if await cursor.fetchone() is None:
+                return None
+            # Each status is a range of idx_participants_event_status, counted without touching the rows
+            cursor = await db.execute(
+                "SELECT participation_status, COUNT(*) FROM participants WHERE event_id = ? GROUP BY participation_status",
+                (event_id,)
+            )
+            return Counter({status: count for status, count in await cursor.fetchall()})
+
+    async def _load(self, event_id: int) -> Optional[Roster]:
+        self._loading[event_id] = {}
+        # Votes committed between the read and the overlay below would otherwise be missed
+        pending_before = self.vote_writer.pending_for_event(event_id) if self.vote_writer is not None else {}
+        try:
+            async with self.database.read() as db:
+                cursor = await db.execute("SELECT 1 FROM events WHERE event_id = ?", (event_id,))
+                if await cursor.fetchone() is None:
+                    roster = None
+                else:
+                    cursor = await db.execute(
+                        "SELECT user_id, username, participation_status FROM participants WHERE event_id = ?",
+                        (event_id,)
+                    )
+                    roster = {user_id: (status, username) for user_id, username, status in await cursor.fetchall()}
+        finally:
+            changes = self._loading.pop(event_id)
+        if event_id in self._deleted_while_loading:
+            self._deleted_while_loading.discard(event_id)
+            return None
+        if roster is not None:
+            roster.update(pending_before)
+            if self.vote_writer is not None:
+                roster.update(self.vote_writer.pending_for_event(event_id))
+            roster.update(changes)
+        self._store(event_id, roster)
+        return roster
+
+    def _store(self, event_id: int, roster: Optional[Roster]):
+        self._discard(event_id)
+        if self.max_events <= 0:
+            return
+        self._rosters[event_id] = roster
+        self._members += len(roster or ())
+        while len(self._rosters) > 1 and (
+            len(self._rosters) > self.max_events or self._members > self.max_members
+        ):
+            self._discard(next(iter(self._rosters)))
+
+    def _discard(self, event_id: int):
+        roster = self._rosters.pop(event_id, None)
+        self._members -= len(roster or ())
+
+    def add_event(self, event_id: int):
+        self._store(event_id, {})
+
+    def set_status(self, event_id: int, user_id: int, username: str, status: str):
+        if event_id in self._loading:
+            self._loading[event_id][user_id] = (status, username)
+        roster = self._rosters.get(event_id)
+        if roster is not None:
+            if user_id not in roster:
+                self._members += 1
+            roster[user_id] = (status, username)
+
+    def invalidate(self, event_id: int):
+        self._discard(event_id)
+        if event_id in self._loading:
+            # The in-flight load may have read the row before it was deleted
+            self._deleted_while_loading.add(event_id)
+
+
+async def iter_participants(
+    database: Database, event_id: int, batch_size: int = 1000
+) -> AsyncIterator[tuple[int, str, str]]:
+    """Yields (user_id, username, status) in user_id order.
+
+    Each batch is a separate keyset query on the primary key, so no connection is held
+    while the caller consumes rows.
+    """
+    after = -2 ** 63
+    while True:
+        rows = await database.fetchall(
+            "SELECT user_id, username, participation_status FROM participants "
+            "WHERE event_id = ? AND user_id > ? ORDER BY user_id LIMIT ?",
+            (event_id, after, batch_size)
+        )
+        for user_id, username, status in rows:
+            yield user_id, username, status
+        if len(rows) < batch_size:
+            return
+        after = rows[-1][0]
+
+
+class RosterCSVFile(InputFile):
+    """An event's participants as a CSV upload, generated batch by batch while it is sent."""
+
+    def __init__(self, database: Database, event_id: int, filename: Optional[str] = None, batch_size: int = 1000):
+        super().__init__(filename=filename or f"participants_{event_id}.csv")
+        self.database = database
+        self.event_id = event_id
+        self.batch_size = batch_size
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write("\ufeff")  # without a BOM Excel opens UTF-8 CSV in the locale's code page
+        writer.writerow(("user_id", "username", "status"))
+        async for row in iter_participants(self.database, self.event_id, self.batch_size):
+            writer.writerow(row)
+            if buffer.tell() >= self.chunk_size:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,51 @@
+import re
+from typing import Optional
+
+from db import Database
+
+_WORD = re.compile(r"\w+")
+
+# unicode61 folds case but treats Ё as a separate letter; users rarely type it, so both the
+# index and the queries use Е. The same expression is used in init_db's FTS triggers.
+FTS_TEXT_SQL = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+
+# rank is bm25 with the column weights set in init_db
+SEARCH_SQL = """
+SELECT t.event_id, t.title, t.description, t.date, {archived}
+FROM {table}_fts f JOIN {table} t ON t.event_id = f.rowid
+WHERE {table}_fts MATCH ? ORDER BY f.rank LIMIT ?
+"""
+SEARCH_ACTIVE_SQL = SEARCH_SQL.format(table="events", archived=0)
+SEARCH_ARCHIVE_SQL = SEARCH_SQL.format(table="events_archive", archived=1)
+
+
+def normalize(text: str) -> str:
+    return text.replace("ё", "е").replace("Ё", "Е")
+
+
+def match_expression(text: str, max_terms: int = 8) -> Optional[str]:
+    """FTS5 query that matches every word of ``text`` as a prefix; None if there is nothing to search for.
+
+    Words are quoted, so FTS5 syntax in user input (AND, NEAR, column filters) is searched literally.
+    One-letter words are matched exactly: as prefixes they would expand to a large part of the vocabulary.
+    """
+    words = _WORD.findall(normalize(text))[:max_terms]
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' if len(word) > 1 else f'"{word}"' for word in words)
+
+
+async def search_events(database: Database, text: str, limit: int = 10, offset: int = 0) -> list:
+    """Active events first, then archived ones, each ordered by bm25 with titles weighted over descriptions.
+
+    Returns (event_id, title, description, date, archived) rows. Ranking has to score every
+    match, so the archive is only searched when active events do not fill the page.
+    """
+    query = match_expression(text)
+    if query is None:
+        return []
+    window = offset + limit
+    rows = await database.fetchall(SEARCH_ACTIVE_SQL, (query, window))
+    if len(rows) < window:
+        rows += await database.fetchall(SEARCH_ARCHIVE_SQL, (query, window - len(rows)))
+    return rows[offset:window]
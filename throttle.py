@@ -0,0 +1,112 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject
+
+from outbound import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# (rate in presses per second, burst)
+Limit = tuple[float, float]
+
+
+def callback_prefix(data: Optional[str]) -> str:
+    """``join_12`` → ``join``; the handlers are routed by the same prefixes."""
+    return (data or "").split("_", 1)[0]
+
+
+class CallbackThrottleMiddleware(BaseMiddleware):
+    """Drops repeated and too frequent button presses before they reach the filters and handlers.
+
+    Register as an outer middleware on ``callback_query``. A press identical (same user, same
+    data) to one that is still being handled is answered right away and dropped. Every user
+    has a token bucket per callback prefix with the rate and burst from ``limits`` (or
+    ``default_limit``; prefixes without either are not throttled); presses over it are
+    dropped, and only the first of them per bucket in each refill window (``1 / rate``
+    seconds) is answered with ``throttled_text``, so a user hammering a button does not
+    spend the bot's API budget.
+
+    Buckets live in memory, one process each: at most ``max_buckets`` of them, refilled
+    (idle) ones are dropped first, then the least recently created.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Limit],
+        default_limit: Optional[Limit] = None,
+        max_buckets: int = 50_000,
+        throttled_text: Optional[str] = None,
+    ):
+        self.limits = limits
+        self.default_limit = default_limit
+        self.max_buckets = max_buckets
+        self.throttled_text = throttled_text
+        self.duplicates = 0
+        self.throttled = 0
+        self._buckets: dict[tuple[int, str], TokenBucket] = {}
+        # (user_id, prefix) -> monotonic time until which further throttled presses go unanswered
+        self._answered_until: dict[tuple[int, str], float] = {}
+        self._in_flight: set[tuple[int, str]] = set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, CallbackQuery) or event.from_user is None:
+            return await handler(event, data)
+
+        key = (event.from_user.id, event.data or "")
+        if key in self._in_flight:
+            self.duplicates += 1
+            await self._answer(event)
+            return None
+
+        prefix = callback_prefix(event.data)
+        limit = self.limits.get(prefix, self.default_limit)
+        if limit is not None:
+            bucket = self._bucket(event.from_user.id, prefix, limit)
+            if bucket.delay() > 0:
+                self.throttled += 1
+                now = time.monotonic()
+                if self._answered_until.get((event.from_user.id, prefix), 0.0) <= now:
+                    self._answered_until[(event.from_user.id, prefix)] = now + 1 / bucket.rate
+                    await self._answer(event, self.throttled_text)
+                return None
+            bucket.reserve()
+
+        self._in_flight.add(key)
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight.discard(key)
+
+    def _bucket(self, user_id: int, prefix: str, limit: Limit) -> TokenBucket:
+        key = (user_id, prefix)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._prune()
+            rate, burst = limit
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def _prune(self):
+        # A refilled bucket is the same as a new one, so dropping it loses nothing
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.idle}
+        excess = len(self._buckets) - self.max_buckets // 2
+        if excess > 0:
+            for key in list(self._buckets)[:excess]:
+                del self._buckets[key]
+        self._answered_until = {key: until for key, until in self._answered_until.items() if key in self._buckets}
+
+    @staticmethod
+    async def _answer(callback: CallbackQuery, text: Optional[str] = None):
+        try:
+            await callback.answer(text)
+        except Exception as e:
+            logger.error(f"Не удалось ответить на повторное нажатие: {e}")
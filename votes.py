@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Optional
+
+from db import Database
+
+logger = logging.getLogger(__name__)
+
+# The EXISTS guard drops votes for events deleted while the vote was still buffered
+UPSERT_PARTICIPANT = """
+    INSERT OR REPLACE INTO participants (event_id, user_id, username, participation_status)
+    SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM events WHERE event_id = ?)
+"""
+
+
+class VoteWriter:
+    """Write-behind queue for participant upserts.
+
+    Votes are merged by (event_id, user_id) so only the last status is written, and
+    the buffer is flushed in one transaction every ``flush_interval`` seconds or as
+    soon as ``max_batch`` distinct rows are pending.
+    """
+
+    def __init__(self, database: Database, flush_interval: float = 0.05, max_batch: int = 500):
+        self.database = database
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.commits = 0
+        self.rows_written = 0
+        self._pending: dict[tuple[int, int], tuple[str, str]] = {}
+        self._inflight: dict[tuple[int, int], tuple[str, str]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        # Let the loop finish its current flush instead of cancelling it mid-transaction
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def pending_for_event(self, event_id: int) -> dict[int, tuple[str, str]]:
+        """Buffered votes of one event as user_id -> (status, username)."""
+        return {
+            user_id: (status, username)
+            for entries in (self._inflight, self._pending)
+            for (vote_event_id, user_id), (username, status) in entries.items()
+            if vote_event_id == event_id
+        }
+
+    def submit(self, event_id: int, user_id: int, username: str, status: str):
+        self._pending[(event_id, user_id)] = (username, status)
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    def discard_event(self, event_id: int):
+        for key in [key for key in self._pending if key[0] == event_id]:
+            del self._pending[key]
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, {}
+            rows = [
+                (event_id, user_id, username, status, event_id)
+                for (event_id, user_id), (username, status) in self._inflight.items()
+            ]
+            try:
+                async with self.database.write() as db:
+                    await db.executemany(UPSERT_PARTICIPANT, rows)
+                self.commits += 1
+                self.rows_written += len(rows)
+            except Exception as e:
+                logger.error(f"Ошибка при записи голосов ({len(rows)} шт.): {e}")
+                # Newer votes submitted during the failed write win over the requeued ones
+                self._pending = {**self._inflight, **self._pending}
+            finally:
+                self._inflight = {}
@@ -0,0 +1,77 @@
+import logging
+import multiprocessing
+import os
+import signal
+from typing import Any, Callable, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    path: str,
+    secret_token: Optional[str] = None,
+    health: Optional[Callable[[], dict[str, Any]]] = None,
+    metrics: Optional[Callable[[], str]] = None,
+) -> web.Application:
+    """aiohttp application serving Telegram updates on ``path``, a health check on /healthz
+    and, if ``metrics`` is given, its Prometheus text output on /metrics."""
+    app = web.Application()
+
+    async def healthz(request: web.Request) -> web.Response:
+        report = {"status": "ok", "pid": os.getpid(), **(health() if health else {})}
+        return web.json_response(report, status=200 if report["status"] == "ok" else 503)
+
+    app.router.add_get("/healthz", healthz)
+    if metrics is not None:
+        async def metrics_endpoint(request: web.Request) -> web.Response:
+            return web.Response(text=metrics(), content_type="text/plain", headers={"X-Worker-Pid": str(os.getpid())})
+
+        app.router.add_get("/metrics", metrics_endpoint)
+    SimpleRequestHandler(dispatcher=dispatcher, bot=bot, secret_token=secret_token).register(app, path=path)
+    setup_application(app, dispatcher, bot=bot)
+    return app
+
+
+def _serve_worker(app_factory: Callable[[int], web.Application], index: int, host: str, port: int, reuse_port: bool):
+    logger.info(f"Webhook worker {index} (pid {os.getpid()}) listening on {host}:{port}")
+    # run_app handles SIGINT/SIGTERM itself and runs the app's shutdown hooks before exiting
+    web.run_app(app_factory(index), host=host, port=port, reuse_port=reuse_port, print=None)
+
+
+def run_webhook(app_factory: Callable[[int], web.Application], host: str, port: int, workers: int = 1):
+    """Serve the webhook app in ``workers`` processes sharing one port via SO_REUSEPORT.
+
+    ``app_factory`` receives the worker index; index 0 is the primary worker.
+    """
+    if workers <= 1:
+        _serve_worker(app_factory, 0, host, port, reuse_port=False)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=_serve_worker, args=(app_factory, index, host, port, True), name=f"webhook-worker-{index}"
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop(signum, frame):
+        logger.info(f"Received signal {signum}, stopping {len(processes)} webhook workers")
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    # Ctrl+C reaches the whole process group, so workers already got it; forwarding would interrupt their shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            logger.error(f"{process.name} exited with code {process.exitcode}")